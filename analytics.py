@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+WhatsApp Chat Analytics
+Per-sender counts, a weekday/hour heatmap, response times and daily volume from one streaming pass
+Reads parser output (.json, .jsonl, .sqlite) or an export (.txt, .zip) directly
+"""
+
+import os
+import sys
+import csv
+import json
+from array import array
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+# Upper bounds (seconds) of the response-time buckets; the last bucket is open-ended
+RESPONSE_BOUNDS = [60, 300, 900, 3600, 6 * 3600, 86400]
+RESPONSE_LABELS = ['<1m', '1-5m', '5-15m', '15m-1h', '1-6h', '6-24h', '>1d']
+
+
+def percentile(values: List[int], fraction: float) -> Optional[int]:
+    """Nearest-rank percentile of already sorted values"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class SenderStats:
+    """Running totals for one sender"""
+    __slots__ = ('messages', 'words', 'media', 'characters', 'reply_seconds')
+
+    def __init__(self):
+        self.messages = 0
+        self.words = 0
+        self.media = 0
+        self.characters = 0
+        # Seconds between the other side's last message and this sender's answer
+        self.reply_seconds = array('I')
+
+
+class ChatAnalytics:
+    """
+    Statistics accumulated over a stream of messages in the chat.json schema
+    A reply is a message whose sender differs from the previous (non-system) message's;
+    its response time is the gap between the two
+    Day-level work (parsing the date, weekday) happens once per day, not once per message
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.type_counts = {'text': 0, 'media': 0, 'system': 0}
+        self.senders: Dict[str, SenderStats] = {}
+        self.heatmap = [[0] * 24 for _ in range(7)]
+        self.daily: Dict[str, int] = {}
+        self.response_counts = [0] * len(RESPONSE_LABELS)
+        self.invalid_timestamps = 0
+
+    def track(self, messages: Iterable[Dict]) -> Iterator[Dict]:
+        """Yield the messages unchanged while counting them, so stats ride along with any other pass"""
+        type_counts = self.type_counts
+        senders = self.senders
+        heatmap = self.heatmap
+        daily = self.daily
+        response_counts = self.response_counts
+        bounds = RESPONSE_BOUNDS
+        open_bucket = len(RESPONSE_BOUNDS)
+        # HH:MM:SS -> seconds since midnight; at most 86400 entries, far fewer in practice
+        clock: Dict[str, int] = {}
+
+        day = None
+        day_count = 0
+        day_row = None
+        day_seconds = 0
+        invalid = 0
+        previous_sender = None
+        previous_seconds = None
+        for message in messages:
+            yield message
+            msg_type = message['type']
+            type_counts[msg_type] = type_counts.get(msg_type, 0) + 1
+            timestamp = message['timestamp']
+
+            if timestamp[:10] != day:
+                if day is not None:
+                    daily[day] = daily.get(day, 0) + day_count
+                day = timestamp[:10]
+                day_count = 0
+                try:
+                    day_date = date.fromisoformat(day)
+                    day_row = heatmap[day_date.weekday()]
+                    day_seconds = day_date.toordinal() * 86400
+                except ValueError:
+                    day_row = None
+            day_count += 1
+            if day_row is None:
+                invalid += 1
+                seconds = None
+            else:
+                time_of_day = timestamp[11:19]
+                offset = clock.get(time_of_day)
+                if offset is None:
+                    offset = clock[time_of_day] = (int(time_of_day[:2]) * 3600 + int(time_of_day[3:5]) * 60
+                                                   + int(time_of_day[6:8]))
+                day_row[offset // 3600] += 1
+                seconds = day_seconds + offset
+
+            sender = message['sender']
+            if sender is None or msg_type == 'system':
+                continue
+            stats = senders.get(sender)
+            if stats is None:
+                stats = senders[sender] = SenderStats()
+            stats.messages += 1
+            text = message['text']
+            if text:
+                stats.words += len(text.split())
+                stats.characters += len(text)
+            if msg_type == 'media':
+                stats.media += 1
+
+            if sender != previous_sender:
+                if previous_sender is not None and seconds is not None and previous_seconds is not None:
+                    gap = seconds - previous_seconds
+                    if gap >= 0:
+                        stats.reply_seconds.append(gap)
+                        for index, bound in enumerate(bounds):
+                            if gap < bound:
+                                response_counts[index] += 1
+                                break
+                        else:
+                            response_counts[open_bucket] += 1
+                previous_sender = sender
+            if seconds is not None:
+                previous_seconds = seconds
+
+        if day is not None:
+            daily[day] = daily.get(day, 0) + day_count
+        self.invalid_timestamps += invalid
+        self.total = sum(type_counts.values())
+
+    def update(self, messages: Iterable[Dict]) -> 'ChatAnalytics':
+        """Count all messages"""
+        for _ in self.track(messages):
+            pass
+        return self
+
+    def summary(self) -> Dict:
+        """Everything as one JSON-ready dict"""
+        senders = []
+        all_replies = []
+        for name, stats in sorted(self.senders.items(), key=lambda item: -item[1].messages):
+            replies = sorted(stats.reply_seconds)
+            all_replies.append(replies)
+            senders.append({
+                'name': name,
+                'messages': stats.messages,
+                'words': stats.words,
+                'media': stats.media,
+                'characters': stats.characters,
+                'replies': len(replies),
+                'reply_median_seconds': percentile(replies, 0.5),
+                'reply_p90_seconds': percentile(replies, 0.9),
+            })
+        replies = sorted(seconds for group in all_replies for seconds in group)
+        valid_days = [day for day in self.daily if day[:1].isdigit()]
+        return {
+            'messages': self.total,
+            'types': self.type_counts,
+            'invalid_timestamps': self.invalid_timestamps,
+            'first_day': min(valid_days) if valid_days else None,
+            'last_day': max(valid_days) if valid_days else None,
+            'active_days': len(valid_days),
+            'senders': senders,
+            'heatmap': {
+                'weekdays': WEEKDAYS,
+                'counts': self.heatmap,
+            },
+            'hours': [sum(row[hour] for row in self.heatmap) for hour in range(24)],
+            'response_times': {
+                'buckets': RESPONSE_LABELS,
+                'counts': self.response_counts,
+                'median_seconds': percentile(replies, 0.5),
+                'p90_seconds': percentile(replies, 0.9),
+            },
+            'daily': {day: self.daily[day] for day in sorted(valid_days)},
+        }
+
+    def write_json(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, separators=(',', ':'))
+
+    def write_csv(self, directory: str):
+        """senders.csv, heatmap.csv, response_times.csv and daily.csv in directory"""
+        summary = self.summary()
+        os.makedirs(directory, exist_ok=True)
+
+        def write(name, header, rows):
+            with open(os.path.join(directory, name), 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(rows)
+
+        columns = ['name', 'messages', 'words', 'media', 'characters', 'replies',
+                   'reply_median_seconds', 'reply_p90_seconds']
+        write('senders.csv', columns, ([sender[column] for column in columns] for sender in summary['senders']))
+        write('heatmap.csv', ['weekday'] + [f"{hour:02d}" for hour in range(24)],
+              ([weekday] + row for weekday, row in zip(WEEKDAYS, self.heatmap)))
+        write('response_times.csv', ['bucket', 'replies'], zip(RESPONSE_LABELS, self.response_counts))
+        write('daily.csv', ['day', 'messages'], summary['daily'].items())
+
+
+def format_seconds(seconds: Optional[int]) -> str:
+    if seconds is None:
+        return '-'
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+
+
+def main():
+    import argparse
+    import time
+
+    arg_parser = argparse.ArgumentParser(description='Summarize a WhatsApp chat: senders, activity and response times')
+    arg_parser.add_argument('chat_file', nargs='?', default='chat.json',
+                            help='chat.json, a .jsonl or .sqlite file from parser.py, or an export .txt/.zip '
+                                 '(default: chat.json)')
+    arg_parser.add_argument('--json', metavar='PATH', help='Write the full summary as JSON')
+    arg_parser.add_argument('--csv', metavar='DIR', help='Write the tables as CSV files into DIR')
+    arg_parser.add_argument('--top', type=int, default=10, help='Senders to list (default: 10)')
+    args = arg_parser.parse_args()
+
+    if not os.path.exists(args.chat_file):
+        print(f"❌ {args.chat_file} not found!")
+        sys.exit(1)
+
+    from make_standalone import iter_chat_file
+    start = time.perf_counter()
+    analytics = ChatAnalytics().update(iter_chat_file(args.chat_file))
+    summary = analytics.summary()
+    elapsed = time.perf_counter() - start
+
+    print(f"✓ Analyzed {summary['messages']:,} messages in {elapsed:.1f}s")
+    if summary['first_day']:
+        print(f"  {summary['first_day']} to {summary['last_day']}, active on {summary['active_days']:,} days")
+    print(f"  Text: {summary['types']['text']:,}  Media: {summary['types']['media']:,}  "
+          f"System: {summary['types']['system']:,}")
+
+    print(f"\n{'Sender':<24} {'Messages':>10} {'Words':>11} {'Media':>8} {'Median reply':>13}")
+    for sender in summary['senders'][:args.top]:
+        print(f"{sender['name'][:24]:<24} {sender['messages']:>10,} {sender['words']:>11,} {sender['media']:>8,} "
+              f"{format_seconds(sender['reply_median_seconds']):>13}")
+
+    hours = summary['hours']
+    if any(hours):
+        weekday_totals = [sum(row) for row in analytics.heatmap]
+        print(f"\nBusiest hour: {hours.index(max(hours)):02d}:00   "
+              f"Busiest day: {WEEKDAYS[weekday_totals.index(max(weekday_totals))]}   "
+              f"Median response: {format_seconds(summary['response_times']['median_seconds'])}")
+
+    if args.json:
+        analytics.write_json(args.json)
+        print(f"✓ Saved summary to {args.json}")
+    if args.csv:
+        analytics.write_csv(args.csv)
+        print(f"✓ Saved CSV tables to {args.csv}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -2,8 +2,159 @@
  * WhatsApp Chat Viewer
  * Renders chat.json into WhatsApp-style interface
  * Handles media, date separators, system messages, and multiline text
+ * Only the rows in view are rendered, so large chats open as fast as small ones
  */
 
+/**
+ * Windowed list: only the rows in the viewport plus a buffer are in the DOM
+ * Row heights start as estimates and are replaced by measurements once a row has been shown
+ */
+class VirtualList {
+    constructor(container, rowCount, renderRow, estimateRow) {
+        this.container = container;
+        this.rowCount = rowCount;
+        this.renderRow = renderRow;
+        this.buffer = 10;
+
+        // Fenwick tree over row heights so offsets stay O(log n) as rows get measured
+        this.heights = new Float64Array(rowCount);
+        this.tree = new Float64Array(rowCount + 1);
+        for (let i = 0; i < rowCount; i++) {
+            this.heights[i] = estimateRow(i);
+            this.tree[i + 1] += this.heights[i];
+            const parent = (i + 1) + ((i + 1) & -(i + 1));
+            if (parent <= rowCount) this.tree[parent] += this.tree[i + 1];
+        }
+        this.topStep = 1;
+        while (this.topStep * 2 <= rowCount) this.topStep *= 2;
+
+        this.rendered = new Map();
+        this.pool = [];
+        this.pinnedToBottom = false;
+        this.frame = null;
+
+        this.spacer = document.createElement('div');
+        this.spacer.className = 'virtual-spacer';
+        container.innerHTML = '';
+        container.appendChild(this.spacer);
+
+        // Images and fonts change row heights after they are first measured
+        this.resizeObserver = new ResizeObserver(() => this.schedule());
+        container.addEventListener('scroll', () => {
+            this.pinnedToBottom = container.scrollTop + container.clientHeight >= container.scrollHeight - 4;
+            this.schedule();
+        }, { passive: true });
+        window.addEventListener('resize', () => this.schedule());
+    }
+
+    addHeight(index, delta) {
+        for (let i = index + 1; i <= this.rowCount; i += i & -i) this.tree[i] += delta;
+    }
+
+    offsetOf(index) {
+        let offset = 0;
+        for (let i = index; i > 0; i -= i & -i) offset += this.tree[i];
+        return offset;
+    }
+
+    indexAt(offset) {
+        let index = 0;
+        for (let step = this.topStep; step > 0; step >>= 1) {
+            if (index + step <= this.rowCount && this.tree[index + step] <= offset) {
+                index += step;
+                offset -= this.tree[index];
+            }
+        }
+        return Math.min(index, this.rowCount - 1);
+    }
+
+    schedule() {
+        if (this.frame === null) {
+            this.frame = requestAnimationFrame(() => {
+                this.frame = null;
+                this.update();
+            });
+        }
+    }
+
+    update() {
+        if (!this.rowCount) return;
+        const container = this.container;
+        const base = this.spacer.offsetTop;
+        const top = Math.max(0, container.scrollTop - base);
+        const anchor = this.indexAt(top);
+        const anchorDelta = top - this.offsetOf(anchor);
+        const first = Math.max(0, anchor - this.buffer);
+        const last = Math.min(this.rowCount - 1, this.indexAt(top + container.clientHeight) + this.buffer);
+
+        // Recycle rows that left the window
+        for (const [index, row] of this.rendered) {
+            if (index < first || index > last) {
+                this.resizeObserver.unobserve(row);
+                row.remove();
+                this.pool.push(row);
+                this.rendered.delete(index);
+            }
+        }
+
+        for (let index = first; index <= last; index++) {
+            if (this.rendered.has(index)) continue;
+            let row = this.pool.pop();
+            if (!row) {
+                row = document.createElement('div');
+                row.className = 'virtual-row';
+            }
+            row.innerHTML = this.renderRow(index);
+            this.spacer.appendChild(row);
+            this.rendered.set(index, row);
+            this.resizeObserver.observe(row);
+        }
+
+        // Measure after all rows are in so layout is computed once
+        let changed = false;
+        for (const [index, row] of this.rendered) {
+            const height = row.offsetHeight;
+            if (height !== this.heights[index]) {
+                this.addHeight(index, height - this.heights[index]);
+                this.heights[index] = height;
+                changed = true;
+            }
+        }
+
+        this.spacer.style.height = this.offsetOf(this.rowCount) + 'px';
+        for (const [index, row] of this.rendered) {
+            row.style.top = this.offsetOf(index) + 'px';
+        }
+
+        // Keep the row at the top of the viewport still while estimates are corrected
+        if (this.pinnedToBottom) {
+            container.scrollTop = container.scrollHeight;
+        } else if (changed) {
+            container.scrollTop = base + this.offsetOf(anchor) + anchorDelta;
+        }
+        if (changed) this.schedule();
+    }
+
+    scrollToIndex(index, margin = 0) {
+        // margin leaves that many pixels of earlier rows above the target
+        this.pinnedToBottom = false;
+        this.container.scrollTop = this.spacer.offsetTop + this.offsetOf(index) - margin;
+        this.update();
+    }
+
+    refresh() {
+        // Re-render the rows in view, e.g. after the search highlight changed
+        for (const [index, row] of this.rendered) row.innerHTML = this.renderRow(index);
+        this.schedule();
+    }
+
+    scrollToBottom() {
+        this.pinnedToBottom = true;
+        this.container.scrollTop = this.container.scrollHeight;
+        this.update();
+    }
+}
+
 class WhatsAppChatViewer {
     constructor(config = {}) {
         // Configuration
@@ -13,6 +164,7 @@ class WhatsAppChatViewer {
         
         // DOM elements
         this.messagesContainer = document.getElementById('chatMessages');
+        this.jumpInput = this.createJumpInput();
         this.lightbox = document.getElementById('lightbox');
         this.lightboxImage = document.getElementById('lightboxImage');
         this.lightboxVideo = document.getElementById('lightboxVideo');
@@ -20,7 +172,9 @@ class WhatsAppChatViewer {
         
         // State
         this.messages = [];
-        this.lastDate = null;
+        this.rows = [];
+        // Size and preview of each media file, from the index make_standalone.py writes
+        this.mediaFiles = {};
         
         // Initialize
         this.init();
@@ -30,12 +184,11 @@ class WhatsAppChatViewer {
         try {
             // Load chat data
             await this.loadChat();
+            await this.loadMediaIndex();
             
-            // Render messages
+            // Render the rows around the viewport, starting at the bottom
             this.renderMessages();
-            
-            // Scroll to bottom
-            this.scrollToBottom();
+            this.list.scrollToBottom();
             
             // Setup event listeners
             this.setupEventListeners();
@@ -59,125 +212,148 @@ class WhatsAppChatViewer {
         }
     }
     
+    async loadMediaIndex() {
+        // Optional: without it, media are shown from the originals
+        try {
+            const response = await fetch(this.mediaPath + '.thumbs/index.json');
+            if (response.ok) {
+                this.mediaFiles = (await response.json()).files || {};
+            }
+        } catch (error) {
+            console.warn('No media index, showing originals:', error);
+        }
+    }
+    
+    createJumpInput() {
+        let input = document.getElementById('jumpToDate');
+        if (!input) {
+            input = document.createElement('input');
+            input.type = 'date';
+            input.id = 'jumpToDate';
+            input.className = 'jump-to-date';
+            input.title = 'Jump to date';
+            const header = document.querySelector('.header-actions') || document.querySelector('.header-content');
+            if (header) header.appendChild(input);
+        }
+        return input;
+    }
+    
     renderMessages() {
-        // Clear loading message
-        this.messagesContainer.innerHTML = '';
-        
-        // Render each message
-        this.messages.forEach((message, index) => {
-            this.renderMessage(message, index);
+        // Interleave a date separator row wherever the day changes
+        let day = null;
+        this.messages.forEach((message) => {
+            const messageDay = message.timestamp.slice(0, 10);
+            if (messageDay !== day) {
+                this.rows.push({ separator: true, day: messageDay, timestamp: message.timestamp });
+                day = messageDay;
+            }
+            this.rows.push(message);
         });
+    
+        // Only the visible rows plus a buffer are kept in the DOM
+        this.list = new VirtualList(this.messagesContainer, this.rows.length,
+                                    (index) => this.renderRow(this.rows[index]),
+                                    (index) => this.estimateHeight(this.rows[index]));
+    
+        if (this.messages.length) {
+            this.jumpInput.min = this.messages[0].timestamp.slice(0, 10);
+            this.jumpInput.max = this.messages[this.messages.length - 1].timestamp.slice(0, 10);
+        }
     }
     
-    renderMessage(message, index) {
-        const messageDate = this.parseDate(message.timestamp);
-        
-        // Add date separator if date changed
-        if (this.shouldShowDateSeparator(messageDate)) {
-            this.addDateSeparator(messageDate);
-            this.lastDate = messageDate;
+    renderRow(row) {
+        if (row.separator) {
+            return `<div class="date-separator"><span>${this.formatDateSeparator(this.parseDate(row.timestamp))}</span></div>`;
         }
-        
+    
         // Render based on message type
-        switch (message.type) {
+        switch (row.type) {
             case 'system':
-                this.renderSystemMessage(message);
-                break;
+                return `<div class="message-system"><div class="system-content">${this.escapeHtml(row.text)}</div></div>`;
             case 'text':
             case 'media':
-                this.renderChatMessage(message);
-                break;
+                return this.renderChatMessage(row);
             default:
-                console.warn('Unknown message type:', message.type);
+                console.warn('Unknown message type:', row.type);
+                return '';
         }
     }
     
-    shouldShowDateSeparator(currentDate) {
-        if (!this.lastDate) return true;
-        
-        return currentDate.getFullYear() !== this.lastDate.getFullYear() ||
-               currentDate.getMonth() !== this.lastDate.getMonth() ||
-               currentDate.getDate() !== this.lastDate.getDate();
+    estimateHeight(row) {
+        // Rough first guess; replaced by the real height once the row is rendered
+        if (row.separator) return 60;
+        if (row.type === 'system') return 56;
+        if (row.media) return 300;
+        const lines = (row.text || '').split('\n').length + Math.floor((row.text || '').length / 60);
+        return 52 + 20 * lines;
     }
     
-    addDateSeparator(date) {
-        const separator = document.createElement('div');
-        separator.className = 'date-separator';
-        
-        const dateText = this.formatDateSeparator(date);
-        separator.innerHTML = `<span>${dateText}</span>`;
-        
-        this.messagesContainer.appendChild(separator);
-    }
-    
-    renderSystemMessage(message) {
-        const systemMsg = document.createElement('div');
-        systemMsg.className = 'message-system';
-        
-        systemMsg.innerHTML = `
-            <div class="system-content">${this.escapeHtml(message.text)}</div>
-        `;
-        
-        this.messagesContainer.appendChild(systemMsg);
+    jumpToDate(day) {
+        // First row on or after the chosen day
+        const index = this.rows.findIndex((row) => {
+            const rowDay = row.day || row.timestamp.slice(0, 10);
+            return rowDay >= day && !isNaN(Date.parse(rowDay));
+        });
+        this.list.scrollToIndex(index < 0 ? this.rows.length - 1 : index);
     }
     
     renderChatMessage(message) {
-        const messageDiv = document.createElement('div');
-        
         // Determine if incoming or outgoing
         const isOutgoing = message.sender === this.currentUserName;
-        messageDiv.className = `message ${isOutgoing ? 'outgoing' : 'incoming'}`;
-        
-        const bubble = document.createElement('div');
-        bubble.className = 'message-bubble';
-        
+    
         let bubbleContent = '';
-        
+    
         // Add sender name for incoming messages
         if (!isOutgoing && message.sender) {
             bubbleContent += `<div class="message-sender">${this.escapeHtml(message.sender)}</div>`;
         }
-        
-        // Add media if present
-        if (message.media) {
+    
+        // Add media if present; files media_tools.py found missing are not requested
+        if (message.media && message.media_status && message.media_status !== 'ok') {
+            bubbleContent += `<div class="media-not-found">📎 File not found: ${this.escapeHtml(message.media)}</div>`;
+        } else if (message.media) {
             bubbleContent += this.renderMedia(message.media);
         }
-        
+    
         // Add text if present
         if (message.text) {
             bubbleContent += `<div class="message-text">${this.escapeHtml(message.text)}</div>`;
         }
-        
+    
         // Add timestamp
         const time = this.formatTime(message.timestamp);
         bubbleContent += `<div class="message-time">${time}</div>`;
-        
-        bubble.innerHTML = bubbleContent;
-        messageDiv.appendChild(bubble);
-        this.messagesContainer.appendChild(messageDiv);
+    
+        return `<div class="message ${isOutgoing ? 'outgoing' : 'incoming'}"><div class="message-bubble">${bubbleContent}</div></div>`;
     }
     
     renderMedia(mediaFilename) {
         const mediaUrl = this.mediaPath + mediaFilename;
         const extension = this.getFileExtension(mediaFilename).toLowerCase();
+        // Previews use the thumbnail when there is one; the lightbox opens the original
+        const info = this.mediaFiles[mediaFilename] || {};
+        const previewUrl = info.thumb ? this.mediaPath + info.thumb : mediaUrl;
+        const size = info.width ? `width="${info.width}" height="${info.height}"` : '';
         
         // Image formats
         if (['jpg', 'jpeg', 'png', 'gif', 'webp'].includes(extension)) {
             return `
                 <div class="message-media" data-media="${mediaUrl}" data-type="image">
-                    <img src="${mediaUrl}" alt="Media" loading="lazy" 
+                    <img src="${previewUrl}" ${size} alt="Media" loading="lazy" decoding="async"
                          onerror="this.parentElement.innerHTML='<div class=\\'media-not-found\\'>📷 Image not found: ${this.escapeHtml(mediaFilename)}</div>'">
                 </div>
             `;
         }
         
-        // Video formats
+        // Video formats: a poster image, or a player that fetches nothing until played
         if (['mp4', 'avi', 'mov', 'webm'].includes(extension)) {
+            const onError = `onerror="this.parentElement.innerHTML='<div class=\\'media-not-found\\'>🎥 Video not found: ${this.escapeHtml(mediaFilename)}</div>'"`;
+            const preview = info.thumb
+                ? `<img src="${previewUrl}" ${size} alt="Video" loading="lazy" decoding="async" ${onError}>`
+                : `<video src="${mediaUrl}" preload="none" ${size} ${onError}></video>`;
             return `
                 <div class="message-media" data-media="${mediaUrl}" data-type="video">
-                    <video src="${mediaUrl}" 
-                           onerror="this.parentElement.innerHTML='<div class=\\'media-not-found\\'>🎥 Video not found: ${this.escapeHtml(mediaFilename)}</div>'">
-                    </video>
+                    ${preview}
                     <div class="video-overlay"></div>
                 </div>
             `;
@@ -187,7 +363,7 @@ class WhatsAppChatViewer {
         if (['opus', 'mp3', 'm4a', 'ogg', 'wav'].includes(extension)) {
             return `
                 <div class="audio-player">
-                    <audio controls src="${mediaUrl}"
+                    <audio controls preload="none" src="${mediaUrl}"
                            onerror="this.parentElement.innerHTML='<div class=\\'media-not-found\\'>🔊 Audio not found: ${this.escapeHtml(mediaFilename)}</div>'">
                         Your browser does not support audio playback.
                     </audio>
@@ -204,6 +380,11 @@ class WhatsAppChatViewer {
     }
     
     setupEventListeners() {
+        // Jump to date
+        this.jumpInput.addEventListener('change', () => {
+            if (this.jumpInput.value) this.jumpToDate(this.jumpInput.value);
+        });
+        
         // Media click handler - event delegation
         this.messagesContainer.addEventListener('click', (e) => {
             const mediaElement = e.target.closest('.message-media');
@@ -251,10 +432,6 @@ class WhatsAppChatViewer {
         this.lightboxVideo.pause();
     }
     
-    scrollToBottom() {
-        this.messagesContainer.scrollTop = this.messagesContainer.scrollHeight;
-    }
-    
     showError(message) {
         this.messagesContainer.innerHTML = `
             <div class="loading" style="color: #ff4444;">
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+WhatsApp Batch Converter
+Parses many exports (.txt or the .zip WhatsApp shares) and builds a viewer for each
+Chats run in a process pool; chats whose export has not changed since the last run are skipped
+"""
+
+import io
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+# Bump when the output layout changes so every chat is rebuilt once
+STAMP_VERSION = 1
+STAMP_FILE = '.batch-stamp.json'
+VIEWER_FILE = 'whatsapp_viewer.html'
+EXPORT_EXTENSIONS = ('.txt', '.zip')
+# Attachment and preview folders; a .txt in there is never a chat export
+SKIPPED_FOLDERS = ('media', '.thumbs')
+
+
+def find_exports(inputs: List[str], recursive: bool = False) -> List[str]:
+    """
+    Expand files, directories and glob patterns into a sorted list of export files
+    Folder searches leave out media/ and .thumbs/ folders
+    """
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, '**', '*') if recursive else os.path.join(item, '*')
+            paths = [path for path in glob.glob(pattern, recursive=recursive)
+                     if not in_skipped_folder(os.path.relpath(path, item))]
+        else:
+            paths = glob.glob(item, recursive=recursive) or [item]
+        for path in paths:
+            if os.path.isfile(path) and path.lower().endswith(EXPORT_EXTENSIONS):
+                found.add(os.path.abspath(path))
+    return sorted(found)
+
+
+def in_skipped_folder(relative_path: str) -> bool:
+    folders = os.path.normpath(relative_path).split(os.sep)[:-1]
+    return any(folder.lower() in SKIPPED_FOLDERS for folder in folders)
+
+
+def chat_names(paths: List[str]) -> Dict[str, str]:
+    """Output folder name per export: the file name without extension, numbered on clashes"""
+    names = {}
+    used = set()
+    for path in paths:
+        base = os.path.splitext(os.path.basename(path))[0].strip() or 'chat'
+        name = base
+        n = 2
+        while name.lower() in used:
+            name = f"{base} ({n})"
+            n += 1
+        used.add(name.lower())
+        names[path] = name
+    return names
+
+
+def link_media(source_dir: str, media_dir: str):
+    """Hard-link (or copy, across devices) the media folder of a .txt export into the output"""
+    with os.scandir(source_dir) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_file():
+                continue
+            target_path = os.path.join(media_dir, entry.name)
+            if os.path.exists(target_path) and os.path.getsize(target_path) == entry.stat().st_size:
+                continue
+            os.makedirs(media_dir, exist_ok=True)
+            try:
+                os.link(entry.path, target_path)
+            except OSError:
+                shutil.copy2(entry.path, target_path)
+
+
+def source_media_dir(export: str) -> Optional[str]:
+    """The media/ folder next to a .txt export, if there is one"""
+    if export.lower().endswith('.zip'):
+        return None
+    media_dir = os.path.join(os.path.dirname(export), 'media')
+    return media_dir if os.path.isdir(media_dir) else None
+
+
+def export_stamp(export: str, options: Dict) -> Dict:
+    """What a chat's output depends on: the export file, its media folder and the options"""
+    stat = os.stat(export)
+    stamp = {
+        'version': STAMP_VERSION,
+        'source': export,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'options': options,
+    }
+    media_dir = source_media_dir(export)
+    if media_dir:
+        # Adding or removing a file changes the folder's mtime
+        stamp['media_mtime_ns'] = os.stat(media_dir).st_mtime_ns
+    return stamp
+
+
+def is_up_to_date(chat_dir: str, stamp: Dict, data_file: str) -> bool:
+    """True if the stamp from the last successful run matches and its outputs are still there"""
+    try:
+        with open(os.path.join(chat_dir, STAMP_FILE), encoding='utf-8') as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (previous == stamp and os.path.exists(os.path.join(chat_dir, VIEWER_FILE))
+            and os.path.exists(os.path.join(chat_dir, data_file)))
+
+
+def tee_messages(messages, writer):
+    """Save each message as the viewer consumes it, so the export is parsed only once"""
+    for message in messages:
+        writer.write(message)
+        yield message
+
+
+def convert_chat(export: str, chat_dir: str, options: Dict, force: bool = False) -> Dict:
+    """
+    Parse one export and build its viewer in chat_dir (chat.<format>, media/, whatsapp_viewer.html)
+    Runs in a worker process; returns a result record instead of raising
+    """
+    from parser import WhatsAppParser, is_zip_export, open_writer
+    from make_standalone import generate_standalone_html
+    from media_tools import MediaLibrary, ZipMediaLibrary
+
+    data_file = f"chat.{options['format']}"
+    result = {
+        'export': export,
+        'chat_dir': chat_dir,
+        # Size of the chat text (uncompressed for a .zip), so MB/s compares across both
+        'input_bytes': 0,
+        'messages': 0,
+        'media_files': 0,
+        'media_seconds': 0.0,
+        'seconds': 0.0,
+        'status': 'skipped',
+        'error': None,
+    }
+    stamp = export_stamp(export, options)
+    if not force and is_up_to_date(chat_dir, stamp, data_file):
+        return result
+
+    start = time.perf_counter()
+    log = io.StringIO()
+    try:
+        parser = WhatsAppParser(export, chat_format=options['chat_format'],
+                                date_order=options['date_order'])
+        if not parser.has_headers():
+            # A note or a log that happens to be a .txt: nothing to build
+            result['status'] = 'ignored'
+            result['error'] = 'no WhatsApp messages found'
+            return result
+        result['input_bytes'] = parser.chat_size()
+        os.makedirs(chat_dir, exist_ok=True)
+        media_dir = os.path.join(chat_dir, 'media')
+        # Drop the old stamp first so an interrupted run is redone next time
+        stamp_file = os.path.join(chat_dir, STAMP_FILE)
+        if os.path.exists(stamp_file):
+            os.remove(stamp_file)
+
+        with contextlib.redirect_stdout(log):
+            # A zip is read in place: the chat is streamed from it and only the attachments
+            # it references are extracted
+            messages = parser.iter_messages()
+            media_files = None
+            media_start = time.perf_counter()
+            if is_zip_export(export):
+                # Described serially, like a media folder below
+                library = ZipMediaLibrary(export, media_dir, thumbnails=options['thumbnails'], workers=1)
+                media_files = library.refresh()
+                library.prepare(parser.iter_media_names())
+                messages = library.extract_referenced(messages)
+            else:
+                if source_media_dir(export):
+                    link_media(source_media_dir(export), media_dir)
+                if os.path.isdir(media_dir):
+                    # Chats already run in parallel, so each chat describes its media serially
+                    library = MediaLibrary(media_dir, thumbnails=options['thumbnails'], workers=1)
+                    media_files = library.refresh()
+            if media_files is not None:
+                result['media_files'] = len(media_files)
+            # Media preparation before the parse
+            result['media_seconds'] = time.perf_counter() - media_start
+
+            with open_writer(os.path.join(chat_dir, data_file), options['format']) as writer:
+                generate_standalone_html(tee_messages(messages, writer),
+                                         os.path.join(chat_dir, VIEWER_FILE), me=options['me'],
+                                         media_files=media_files, search=options['search'])
+            result['messages'] = writer.count
+
+        with open(stamp_file, 'w', encoding='utf-8') as f:
+            json.dump(stamp, f, ensure_ascii=False)
+        result['status'] = 'built'
+    except (Exception, SystemExit) as e:
+        # generate_standalone_html reports its own errors and exits; keep its last message
+        lines = [line.strip() for line in log.getvalue().splitlines() if line.strip().startswith('❌')]
+        result['status'] = 'failed'
+        result['error'] = lines[-1].lstrip('❌ ') if lines else f"{type(e).__name__}: {e}"
+        if os.path.isdir(chat_dir) and not os.listdir(chat_dir):
+            os.rmdir(chat_dir)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def print_summary(results: List[Dict], names: Dict[str, str], wall_seconds: float):
+    """Per-chat timing and throughput table, then totals"""
+    width = min(max([len(name) for name in names.values()] + [4]), 40)
+    print(f"\n{'Chat':<{width}}  {'Status':<7}  {'Messages':>9}  {'Input':>8}  {'Media':>7}  "
+          f"{'Time':>7}  {'msg/s':>9}  {'MB/s':>6}")
+    for result in results:
+        name = names[result['export']]
+        if len(name) > width:
+            name = name[:width - 1] + '…'
+        line = f"{name:<{width}}  {result['status']:<7}"
+        if result['status'] == 'built':
+            seconds = result['seconds'] or 1e-9
+            line += (f"  {result['messages']:>9,}  {result['input_bytes'] / 1e6:>6.1f}MB"
+                     f"  {result['media_seconds']:>6.1f}s  {result['seconds']:>6.1f}s"
+                     f"  {result['messages'] / seconds:>9,.0f}  {result['input_bytes'] / 1e6 / seconds:>6.1f}")
+        elif result['error']:
+            line += f"  {result['error']}"
+        print(line)
+
+    built = [result for result in results if result['status'] == 'built']
+    failed = sum(1 for result in results if result['status'] == 'failed')
+    ignored = sum(1 for result in results if result['status'] == 'ignored')
+    messages = sum(result['messages'] for result in built)
+    input_mb = sum(result['input_bytes'] for result in built) / 1e6
+    print(f"\n✓ Built {len(built)}, skipped {len(results) - len(built) - failed - ignored} unchanged, "
+          f"{failed} failed")
+    if ignored:
+        print(f"⚠️  Ignored {ignored} .txt/.zip files without WhatsApp messages")
+    if built:
+        print(f"✓ {messages:,} messages from {input_mb:.1f} MB in {wall_seconds:.1f}s "
+              f"({messages / wall_seconds:,.0f} msg/s, {input_mb / wall_seconds:.1f} MB/s overall)")
+
+
+def main():
+    import argparse
+    from parser import OUTPUT_FORMATS, WhatsAppParser
+
+    arg_parser = argparse.ArgumentParser(
+        description='Convert many WhatsApp exports (.txt or .zip) into standalone viewers',
+        epilog='Example:\n  python batch.py exports/ --output-dir viewers --me "Alice Smith"\n'
+               '  python batch.py "exports/*.zip" --workers 4',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    arg_parser.add_argument('inputs', nargs='+',
+                            help='Export files, folders of exports or glob patterns')
+    arg_parser.add_argument('--output-dir', default='viewers',
+                            help='One subfolder per chat is created here (default: viewers)')
+    arg_parser.add_argument('--recursive', action='store_true',
+                            help='Also look for exports in subfolders')
+    arg_parser.add_argument('--me', default='You',
+                            help='Your name as it appears in the chats (default: You)')
+    arg_parser.add_argument('--format', choices=sorted(OUTPUT_FORMATS), default='json',
+                            help='Format of the parsed data saved next to each viewer (default: json)')
+    arg_parser.add_argument('--chat-format', choices=sorted(WhatsAppParser.CHAT_FORMATS),
+                            help='Export flavour (default: detect per file)')
+    arg_parser.add_argument('--date-order', choices=['dmy', 'mdy'],
+                            help='Date field order (default: detect per file)')
+    arg_parser.add_argument('--no-thumbnails', action='store_true',
+                            help='Show original media files instead of generated previews')
+    arg_parser.add_argument('--no-search', action='store_true',
+                            help='Leave out the search index (smaller files)')
+    arg_parser.add_argument('--workers', type=int, default=0,
+                            help='Chats converted at once (0 = all cores, default: 0)')
+    arg_parser.add_argument('--force', action='store_true',
+                            help='Rebuild every chat, even if its export has not changed')
+    args = arg_parser.parse_args()
+
+    exports = find_exports(args.inputs, args.recursive)
+    if not exports:
+        print("❌ No .txt or .zip exports found")
+        sys.exit(1)
+
+    options = {
+        'me': args.me,
+        'format': args.format,
+        'chat_format': args.chat_format,
+        'date_order': args.date_order,
+        'thumbnails': not args.no_thumbnails,
+        'search': not args.no_search,
+    }
+    names = chat_names(exports)
+    output_dir = os.path.abspath(args.output_dir)
+    workers = args.workers or os.cpu_count() or 1
+    print(f"✓ Found {len(exports)} exports, converting on {min(workers, len(exports))} processes")
+
+    start = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=min(workers, len(exports))) as executor:
+        futures = {
+            executor.submit(convert_chat, export, os.path.join(output_dir, names[export]),
+                            options, args.force): export
+            for export in exports
+        }
+        # Progress as chats finish; the table below keeps the input order
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results[result['export']] = result
+            print(f"  [{done}/{len(exports)}] {result['status']:<7} {names[result['export']]}")
+
+    print_summary([results[export] for export in exports], names, time.perf_counter() - start)
+    if any(result['status'] == 'failed' for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+WhatsApp Parser Benchmarks
+Generates realistic synthetic exports and measures parse, JSON save and HTML generation
+Results are appended to a JSON Lines file so runs can be compared across changes
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+SENDERS = ['Alice', 'Bob Smith', 'Çağla Ünal', 'Nirmal (Work)', 'Mum ❤️', 'Ravi', 'Zoë', '田中']
+WORDS = [
+    'hello', 'ok', 'see', 'you', 'tomorrow', 'the', 'meeting', 'is', 'at', 'noon',
+    'thanks', 'lol', 'sure', 'where', 'are', 'we', 'going', 'dinner', 'tonight', 'left',
+]
+UNICODE_WORDS = ['café', 'naïve', '😀', '👍🏽', 'привет', 'こんにちは', 'مرحبا', 'ñandú']
+MEDIA_NAMES = ['IMG-{date}-WA{n:04d}.jpg', 'VID-{date}-WA{n:04d}.mp4', 'PTT-{date}-WA{n:04d}.opus']
+SYSTEM_LINES = ['{s} added Dave', '{s} left', '{s} changed the subject from "Trip" to "Trip 2"']
+
+
+def generate_export(path: str, messages: int, multiline_ratio: float = 0.1,
+                    media_ratio: float = 0.15, system_ratio: float = 0.03,
+                    unicode_ratio: float = 0.2, seed: int = 0) -> int:
+    """
+    Write a synthetic Android export with the given mix of message kinds
+    Returns the number of lines written
+    """
+    rng = random.Random(seed)
+    moment = datetime(2019, 1, 1, 8, 0)
+    lines = 0
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('01/01/2019, 8:00\u202fam - Messages and calls are end-to-end encrypted. '
+                'No one outside of this chat, not even WhatsApp, can read or listen to them.\n')
+        lines += 1
+        for n in range(messages):
+            moment += timedelta(seconds=rng.randint(5, 900))
+            hour = moment.hour % 12 or 12
+            period = 'am' if moment.hour < 12 else 'pm'
+            header = f"{moment:%d/%m/%Y}, {hour}:{moment:%M}\u202f{period} - "
+            sender = rng.choice(SENDERS)
+            roll = rng.random()
+            if roll < system_ratio:
+                body = rng.choice(SYSTEM_LINES).format(s=sender)
+            elif roll < system_ratio + media_ratio:
+                name = rng.choice(MEDIA_NAMES).format(date=f"{moment:%Y%m%d}", n=n % 10000)
+                body = f"{sender}: {name} (file attached)"
+            else:
+                pool = UNICODE_WORDS if rng.random() < unicode_ratio else WORDS
+                words = [rng.choice(pool if i % 3 == 0 else WORDS) for i in range(rng.randint(1, 20))]
+                body = f"{sender}: {' '.join(words)}"
+            f.write(header + body + '\n')
+            lines += 1
+            if rng.random() < multiline_ratio:
+                for _ in range(rng.randint(1, 5)):
+                    f.write(' '.join(rng.choice(WORDS) for _ in range(rng.randint(0, 12))) + '\n')
+                    lines += 1
+    return lines
+
+
+def generate_adversarial_export(path: str, lines: int) -> int:
+    """
+    Write one message followed by a pasted log of timestamp-less lines that start with digits
+    Every line looks like it might open a message, so this is the worst case for continuation handling
+    Returns the number of lines written
+    """
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('01/01/2019, 8:00\u202fam - Alice: here is the server log\n')
+        for n in range(lines):
+            f.write(f"{n % 24:02d}:{n % 60:02d}:{n % 60:02d} worker-{n % 8} request {n} done in {n % 997} ms\n")
+        f.write('01/01/2019, 8:05\u202fam - Bob Smith: thanks\n')
+    return lines + 2
+
+
+def _run_stage(stage: str, chat_file: str, work_dir: str, workers: int = 1) -> Dict:
+    """Run one stage in the current (fresh) process and measure it; parse and save on workers processes"""
+    from parser import WhatsAppParser, open_writer
+    from profiling import peak_rss_mb
+
+    json_file = os.path.join(work_dir, 'chat.json')
+    output_file = None
+    count = 0
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    def messages():
+        parser = WhatsAppParser(chat_file)
+        return parser.iter_messages() if workers == 1 else parser.iter_messages_parallel(workers)
+
+    if stage == 'parse':
+        for _ in messages():
+            count += 1
+    elif stage == 'save':
+        output_file = json_file
+        with open_writer(output_file, 'json') as writer:
+            if workers == 1:
+                for message in messages():
+                    writer.write(message)
+            else:
+                # As parser.py does: the workers encode their chunks themselves
+                WhatsAppParser(chat_file).write_parallel(writer, workers)
+        count = writer.count
+    elif stage == 'html':
+        from make_standalone import generate_standalone_html
+        output_file = os.path.join(work_dir, 'whatsapp_viewer.html')
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_standalone_html(json_file, output_file)
+    else:
+        raise ValueError(f"Unknown stage: {stage}")
+
+    return {
+        'stage': stage,
+        'workers': workers,
+        'seconds': round(time.perf_counter() - start, 3),
+        'cpu_seconds': round(time.process_time() - cpu_start, 3),
+        'messages': count,
+        'peak_rss_mb': peak_rss_mb(),
+        'output_bytes': os.path.getsize(output_file) if output_file else None,
+    }
+
+
+def run_stage(stage: str, chat_file: str, work_dir: str, workers: int = 1) -> Dict:
+    """Run a stage in its own process so peak RSS belongs to that stage alone (and its parent side)"""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(_run_stage, stage, chat_file, work_dir, workers).result()
+
+
+def git_revision() -> Optional[str]:
+    """Current commit, so stored results can be tied to a change"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_previous(results_file: str) -> Dict:
+    """Latest stored result per (messages, stage, workers)"""
+    previous = {}
+    if os.path.exists(results_file):
+        with open(results_file, encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                for result in record['results']:
+                    previous[(record['messages'], result['stage'], result.get('workers', 1))] = result
+    return previous
+
+
+def benchmark(sizes: List[int], stages: List[str], results_file: Optional[str],
+              workers: List[int] = (1,), **generator_options):
+    """
+    Generate an export per size, run each stage and report/store the numbers
+    parse and save run once per worker count, with the speedup over the first count
+    """
+    previous = load_previous(results_file) if results_file else {}
+    revision = git_revision()
+
+    for messages in sizes:
+        with tempfile.TemporaryDirectory() as work_dir:
+            chat_file = os.path.join(work_dir, 'chat.txt')
+            lines = generate_export(chat_file, messages, **generator_options)
+            input_bytes = os.path.getsize(chat_file)
+            print(f"\n{messages:,} messages ({lines:,} lines, {input_bytes / 1e6:.1f} MB)")
+
+            results = []
+            for stage, count in [(stage, count) for stage in stages
+                                 for count in (workers if stage != 'html' else [1])]:
+                result = run_stage(stage, chat_file, work_dir, count)
+                if stage != 'html':
+                    result['lines_per_sec'] = round(lines / result['seconds'])
+                    result['messages_per_sec'] = round(result['messages'] / result['seconds'])
+                results.append(result)
+
+                label = f"{stage} x{count}" if len(workers) > 1 and stage != 'html' else stage
+                line = f"  {label:<9} {result['seconds']:>8.2f}s"
+                if 'messages_per_sec' in result:
+                    line += f"  {result['lines_per_sec']:>10,} lines/s  {result['messages_per_sec']:>10,} msg/s"
+                if len(workers) > 1 and stage != 'html':
+                    first = next(r for r in results if r['stage'] == stage)
+                    line += f"  speedup {first['seconds'] / result['seconds']:>5.2f}"
+                if result['peak_rss_mb'] is not None:
+                    line += f"  peak {result['peak_rss_mb']:>8.1f} MB"
+                if result['output_bytes'] is not None:
+                    line += f"  out {result['output_bytes'] / 1e6:>8.1f} MB"
+                before = previous.get((messages, stage, count))
+                if before:
+                    change = (result['seconds'] - before['seconds']) / before['seconds'] * 100
+                    line += f"  ({change:+.0f}% vs last run)"
+                print(line)
+
+            if results_file:
+                record = {
+                    'date': datetime.now().isoformat(timespec='seconds'),
+                    'revision': revision,
+                    'python': sys.version.split()[0],
+                    'messages': messages,
+                    'lines': lines,
+                    'input_bytes': input_bytes,
+                    'options': generator_options,
+                    'results': results,
+                }
+                with open(results_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + '\n')
+
+
+def benchmark_adversarial(sizes: List[int]):
+    """Parse one ever longer message from the .txt and from a .zip copy; time per line should stay flat"""
+    import zipfile
+
+    baseline = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as work_dir:
+            chat_file = os.path.join(work_dir, 'chat.txt')
+            lines = generate_adversarial_export(chat_file, size)
+            zip_file = os.path.join(work_dir, 'chat.zip')
+            with zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_DEFLATED) as archive:
+                archive.write(chat_file, '_chat.txt')
+            print(f"\n{lines:,} lines in one message ({os.path.getsize(chat_file) / 1e6:.1f} MB)")
+
+            for label, path in (('txt', chat_file), ('zip', zip_file)):
+                result = run_stage('parse', path, work_dir)
+                per_line = result['seconds'] / lines * 1e6
+                baseline.setdefault(label, per_line)
+                print(f"  {label:<6} {result['seconds']:>8.2f}s  {per_line:>8.2f} µs/line  "
+                      f"x{per_line / baseline[label]:.2f} per line vs smallest")
+
+
+def main():
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description='Benchmark the WhatsApp parser and HTML generator')
+    arg_parser.add_argument('--messages', type=int, nargs='+', default=[10_000, 100_000],
+                            help='Export sizes to generate (default: 10000 100000)')
+    arg_parser.add_argument('--stages', nargs='+', choices=['parse', 'save', 'html'],
+                            default=['parse', 'save', 'html'],
+                            help='Stages to run; html reads the output of save')
+    arg_parser.add_argument('--workers', type=int, nargs='+', default=[1],
+                            help='Parse and save on each of these process counts (default: 1)')
+    arg_parser.add_argument('--multiline-ratio', type=float, default=0.1)
+    arg_parser.add_argument('--media-ratio', type=float, default=0.15)
+    arg_parser.add_argument('--system-ratio', type=float, default=0.03)
+    arg_parser.add_argument('--unicode-ratio', type=float, default=0.2)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--results', default='bench_results.jsonl',
+                            help="Append results here ('' to disable, default: bench_results.jsonl)")
+    arg_parser.add_argument('--generate', metavar='PATH',
+                            help='Only write a synthetic export of the first size to PATH')
+    arg_parser.add_argument('--adversarial', type=int, nargs='+', metavar='LINES',
+                            help='Instead, time parsing a single message of this many lines each')
+    args = arg_parser.parse_args()
+
+    generator_options = {
+        'multiline_ratio': args.multiline_ratio,
+        'media_ratio': args.media_ratio,
+        'system_ratio': args.system_ratio,
+        'unicode_ratio': args.unicode_ratio,
+        'seed': args.seed,
+    }
+
+    if args.generate:
+        lines = generate_export(args.generate, args.messages[0], **generator_options)
+        print(f"✓ Wrote {args.messages[0]:,} messages ({lines:,} lines) to {args.generate}")
+        return
+
+    if args.adversarial:
+        benchmark_adversarial(args.adversarial)
+        return
+
+    if 'html' in args.stages and 'save' not in args.stages:
+        arg_parser.error("the html stage needs the save stage")
+
+    benchmark(args.messages, args.stages, args.results or None, args.workers, **generator_options)
+
+
+if __name__ == '__main__':
+    main()
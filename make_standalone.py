@@ -5,31 +5,334 @@ Embeds chat.json data directly into index.html for offline viewing
 No server required - just double-click the output HTML!
 """
 
+import re
 import json
 import sys
 import os
+from array import array
+from contextlib import nullcontext
+from datetime import date
+from functools import lru_cache
+from html import escape
 
-def generate_standalone_html(chat_json_path='chat.json', output_path='whatsapp_viewer.html'):
-    """Generate a standalone HTML file with embedded chat data"""
-    
-    # Read the chat.json file
+# Messages per embedded chunk; a chunk is closed at the next day change once it
+# reaches this size (or unconditionally at 4x, for very busy days)
+CHUNK_SIZE = 2000
+
+
+def chunk_messages(messages, chunk_size=CHUNK_SIZE):
+    """
+    Group messages into chunks that start on a new day where possible
+    Yields (messages, continues_previous_day)
+    """
+    chunk = []
+    continued = False
+    day = None
+    for message in messages:
+        message_day = message['timestamp'][:10]
+        if chunk and ((len(chunk) >= chunk_size and message_day != day)
+                      or len(chunk) >= chunk_size * 4):
+            yield chunk, continued
+            continued = message_day == day
+            chunk = []
+        chunk.append(message)
+        day = message_day
+    if chunk:
+        yield chunk, continued
+
+
+# Row kinds and media kinds of the render model embedded in the page
+ROW_SEPARATOR, ROW_SYSTEM, ROW_MESSAGE = range(3)
+MEDIA_IMAGE, MEDIA_VIDEO, MEDIA_AUDIO, MEDIA_FILE = range(1, 5)
+MEDIA_KINDS = {
+    **dict.fromkeys(('jpg', 'jpeg', 'png', 'gif', 'webp'), MEDIA_IMAGE),
+    **dict.fromkeys(('mp4', 'avi', 'mov', 'webm'), MEDIA_VIDEO),
+    **dict.fromkeys(('opus', 'mp3', 'm4a', 'ogg', 'wav'), MEDIA_AUDIO),
+}
+MONTHS = ('JANUARY', 'FEBRUARY', 'MARCH', 'APRIL', 'MAY', 'JUNE', 'JULY',
+          'AUGUST', 'SEPTEMBER', 'OCTOBER', 'NOVEMBER', 'DECEMBER')
+
+
+@lru_cache(maxsize=4096)
+def day_label(day):
+    """
+    Separator for a YYYY-MM-DD day, as (day, label)
+    Days that are not dates get an empty key so "jump to date" skips them
+    """
     try:
-        with open(chat_json_path, 'r', encoding='utf-8') as f:
-            chat_data = json.load(f)
-        print(f"✓ Loaded {len(chat_data)} messages from {chat_json_path}")
-    except FileNotFoundError:
-        print(f"❌ Error: {chat_json_path} not found!")
-        print("   Make sure you've run parser.py first to generate chat.json")
-        sys.exit(1)
-    except json.JSONDecodeError as e:
-        print(f"❌ Error: Invalid JSON in {chat_json_path}")
-        print(f"   {e}")
-        sys.exit(1)
-    
-    # Convert chat data to JavaScript format
-    chat_data_js = json.dumps(chat_data, indent=2, ensure_ascii=False)
+        parsed = date.fromisoformat(day)
+    except ValueError:
+        return '', 'INVALID DATE'
+    return day, f"{MONTHS[parsed.month - 1]} {parsed.day}, {parsed.year}"
+
+
+@lru_cache(maxsize=2048)
+def format_time(hours_minutes):
+    """'HH:MM' from an ISO timestamp as shown in a bubble, e.g. '9:05 PM'"""
+    hours, _, minutes = hours_minutes.partition(':')
+    if not (hours.isdigit() and minutes.isdigit() and len(minutes) == 2):
+        return 'Invalid time'
+    hours = int(hours)
+    return f"{hours % 12 or 12}:{minutes} {'PM' if hours >= 12 else 'AM'}"
+
+
+@lru_cache(maxsize=256)
+def media_kind(filename):
+    """Media kind from the file extension"""
+    return MEDIA_KINDS.get(filename.rpartition('.')[2].lower(), MEDIA_FILE)
+
+
+class RenderModel:
+    """
+    Turns parsed messages into render-ready rows for the viewer
+    Text is escaped and times and day labels formatted here, so the browser only
+    concatenates strings:
+        [ROW_SEPARATOR, day, label]
+        [ROW_SYSTEM, text]
+        [ROW_MESSAGE, sender, outgoing, text, time(, media, media_kind(, width, height, thumb))]
+    sender indexes the escaped names in `senders`; width, height and thumb come from the
+    media manifest (see media_tools.py) when one is given. media_kind is negated for
+    files whose media_status is not 'ok', so the viewer never requests them
+    """
+
+    def __init__(self, me='You', media_files=None):
+        self.me = me
+        self.media_files = media_files or {}
+        self.sender_index = {}
+        self.senders = []
+
+    def rows(self, messages, continued=False):
+        """Rows for one chunk of messages, with a separator wherever the day changes"""
+        rows = []
+        append = rows.append
+        sender_index = self.sender_index
+        me = self.me
+        media_files = self.media_files
+        day = messages[0]['timestamp'][:10] if continued else None
+
+        for message in messages:
+            timestamp = message['timestamp']
+            if timestamp[:10] != day:
+                day = timestamp[:10]
+                append([ROW_SEPARATOR, *day_label(day)])
+
+            text = message['text']
+            text = escape(text) if text else ''
+            if message['type'] == 'system':
+                append([ROW_SYSTEM, text])
+                continue
+
+            sender = message['sender'] or ''
+            index = sender_index.get(sender)
+            if index is None:
+                index = sender_index[sender] = len(self.senders)
+                self.senders.append(escape(sender))
+            row = [ROW_MESSAGE, index, int(sender == me), text, format_time(timestamp[11:16])]
+            media = message['media']
+            if media:
+                status = message.get('media_status', 'ok')
+                if status != 'ok':
+                    row += [escape(media), -media_kind(media)]
+                    append(row)
+                    continue
+                row += [escape(media), media_kind(media)]
+                info = media_files.get(media)
+                if info and (info.get('width') or info.get('thumb')):
+                    row += [info.get('width', 0), info.get('height', 0), escape(info.get('thumb') or '')]
+            append(row)
+        return rows
+
+
+# Search terms: runs of letters, digits and underscores, matched the same way by the viewer
+TOKEN_PATTERN = re.compile(r'\w+')
+MAX_TERM_LENGTH = 32
+BASE36_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+# Most deltas in a posting list are small; these cover everything below 36 * 36
+BASE36_SMALL = [BASE36_DIGITS[n // 36] + BASE36_DIGITS[n % 36] if n >= 36 else BASE36_DIGITS[n]
+                for n in range(36 * 36)]
+
+
+def base36(number):
+    if number < len(BASE36_SMALL):
+        return BASE36_SMALL[number]
+    digits = ''
+    while number:
+        number, remainder = divmod(number, 36)
+        digits = BASE36_DIGITS[remainder] + digits
+    return digits
+
+
+class SearchIndex:
+    """
+    Inverted index over message text for the viewer's search box
+    Text is normalized with the parser's normalize_text rules and lowercased; each term maps
+    to the rows containing it, delta-encoded in base 36 ('3.1.a' is rows 3, 4 and 14)
+    """
+
+    def __init__(self):
+        from parser import normalize_text
+        self.normalize = normalize_text
+        self.postings = {}
+
+    def add(self, row, text):
+        if not text:
+            return
+        postings = self.postings
+        for term in set(TOKEN_PATTERN.findall(self.normalize(text).lower())):
+            term = term[:MAX_TERM_LENGTH]
+            rows = postings.get(term)
+            if rows is None:
+                rows = postings[term] = array('I')
+            # A term cut to MAX_TERM_LENGTH can repeat within one message
+            if not rows or rows[-1] != row:
+                rows.append(row)
+
+    def to_json(self):
+        """{'terms': sorted terms, 'postings': encoded posting list per term}"""
+        # UTF-16 order, which is how the viewer's binary search compares strings
+        terms = sorted(self.postings, key=lambda term: term.encode('utf-16-be'))
+        postings = []
+        for term in terms:
+            rows = self.postings[term]
+            postings.append('.'.join([base36(current - previous) for previous, current in zip((0, *rows), rows)]))
+        return {'terms': terms, 'postings': postings}
+
+
+def embed_json(data):
+    """Compact JSON that is safe inside a <script> element"""
+    # Escaping every '<' rules out '</script>' and '<!--' inside the data
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).replace('<', '\\u003c')
+
+
+def write_chunks(out, messages, me='You', media_files=None, search=True, profile=None):
+    """
+    Stream the chat as <script type="application/json"> chunks of render rows plus a manifest
+    and, with search, the search index
+    Only one chunk is held in memory; the browser parses a chunk's JSON when the viewer needs it
+    profile (a profiling.Profile) times render/serialize/write/search per chunk
+    Returns the number of messages written
+    """
+    stage = profile.stage if profile else lambda name: nullcontext()
+    model = RenderModel(me, media_files)
+    index_builder = SearchIndex() if search else None
+    manifest = {'total': 0, 'me': me, 'senders': model.senders, 'chunks': []}
+    first_row = 0
+    for index, (chunk, continued) in enumerate(chunk_messages(messages)):
+        with stage('render'):
+            rows = model.rows(chunk, continued)
+        with stage('serialize'):
+            data = embed_json(rows)
+        with stage('write'):
+            out.write(f'<script type="application/json" id="chat-chunk-{index}">{data}</script>\n')
+        if index_builder:
+            with stage('search'):
+                # Every non-separator row is the next message of the chunk
+                message_rows = (first_row + number for number, row in enumerate(rows) if row[0] != ROW_SEPARATOR)
+                for row, message in zip(message_rows, chunk):
+                    index_builder.add(row, message['text'])
+        first_row += len(rows)
+        manifest['total'] += len(chunk)
+        # First and last valid timestamps (None if the chunk has none) for "jump to date";
+        # "Invalid timestamp: ..." would sort after every ISO date
+        valid = (message['timestamp'] for message in chunk if day_label(message['timestamp'][:10])[0])
+        first = next(valid, None)
+        last = next((message['timestamp'] for message in reversed(chunk)
+                     if day_label(message['timestamp'][:10])[0]), None)
+        manifest['chunks'].append({
+            'count': len(chunk),
+            'rows': len(rows),
+            'first': first,
+            'last': last,
+            'continued': continued,
+        })
+    out.write(f'<script type="application/json" id="chat-manifest">{embed_json(manifest)}</script>\n')
+    if index_builder:
+        with stage('search'):
+            data = embed_json(index_builder.to_json())
+        with stage('write'):
+            out.write(f'<script type="application/json" id="search-index">{data}</script>\n')
+    if profile:
+        profile.count('messages', manifest['total'])
+        profile.count('chunks', len(manifest['chunks']))
+        profile.count('rows', first_row)
+        if index_builder:
+            profile.count('search_terms', len(index_builder.postings))
+    return manifest['total']
+
+
+def iter_json_array(path, buffer_size=1 << 16):
+    """
+    Yield the objects of a top-level JSON array without loading the whole file
+    Elements must be objects or arrays, so a decode never succeeds on a cut-off value
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(buffer_size)
+        position = 0
+        started = False
+        while True:
+            # Skip whitespace and separators, reading on when the buffer runs out
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position == len(buffer):
+                buffer = f.read(buffer_size)
+                position = 0
+                if not buffer:
+                    raise json.JSONDecodeError('Unterminated array', '', 0)
+                continue
+            if not started:
+                if buffer[position] != '[':
+                    raise json.JSONDecodeError('Expected a JSON array', buffer, position)
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                more = f.read(buffer_size)
+                if not more:
+                    raise
+                buffer = buffer[position:] + more
+                position = 0
+                continue
+            yield item
+            position = end
+            if position > buffer_size:
+                buffer = buffer[position:]
+                position = 0
+
+
+def iter_chat_file(path):
+    """Messages from parser output (.json, .jsonl or .sqlite) or straight from an export (.txt or .zip)"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.jsonl':
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif extension in ('.sqlite', '.db'):
+        from parser import iter_sqlite_messages
+        yield from iter_sqlite_messages(path)
+    elif extension in ('.txt', '.zip'):
+        from parser import WhatsAppParser
+        yield from WhatsAppParser(path).iter_messages()
+    else:
+        yield from iter_json_array(path)
+
+
+def generate_standalone_html(chat_source='chat.json', output_path='whatsapp_viewer.html', me='You',
+                             media_files=None, search=True, profile=None):
+    """
+    Generate a standalone HTML file with embedded chat data
+    chat_source is a file path (see iter_chat_file) or any iterable of message dicts
+    media_files is a media manifest ({name: info}, see media_tools.MediaLibrary) for previews
+    search embeds a full-text index for the search box
+    profile (a profiling.Profile) records per-stage timings
+    """
     
-    # HTML template with embedded data
+    # HTML template; the chat data is streamed in at CHAT_DATA
     html_template = '''<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -120,14 +423,70 @@ body {
     color: var(--text-secondary);
 }
 
+.search-box {
+    display: flex;
+    align-items: center;
+    gap: var(--spacing-xs);
+}
+
+.search-input {
+    background-color: var(--bg-primary);
+    color: var(--text-primary);
+    border: 1px solid rgba(255, 255, 255, 0.1);
+    border-radius: var(--radius-sm);
+    padding: 4px 8px;
+    width: 180px;
+}
+
+.search-count {
+    font-size: 12px;
+    color: var(--text-secondary);
+    min-width: 60px;
+    text-align: center;
+}
+
+.search-nav {
+    background: none;
+    border: none;
+    color: var(--text-secondary);
+    cursor: pointer;
+    font-size: 11px;
+    padding: 4px;
+}
+
+.search-nav:hover { color: var(--text-primary); }
+
+mark {
+    background-color: rgba(255, 210, 121, 0.45);
+    color: inherit;
+    border-radius: 2px;
+}
+
+.search-current .message-bubble, .search-current .system-content {
+    box-shadow: 0 0 0 2px var(--accent-blue);
+}
+
+.jump-to-date {
+    background-color: transparent;
+    color: var(--text-secondary);
+    border: 1px solid rgba(255, 255, 255, 0.1);
+    border-radius: var(--radius-sm);
+    padding: 4px 8px;
+    color-scheme: dark;
+}
+
 .chat-messages {
     flex: 1;
     overflow-y: auto;
     padding: var(--spacing-lg);
     background-image: repeating-linear-gradient(45deg, transparent, transparent 10px, rgba(255, 255, 255, 0.01) 10px, rgba(255, 255, 255, 0.01) 20px);
     background-color: var(--bg-primary);
+    overflow-anchor: none;
 }
 
+.virtual-spacer { position: relative; }
+.virtual-row { position: absolute; left: 0; right: 0; display: flow-root; }
+
 .chat-messages::-webkit-scrollbar { width: 6px; }
 .chat-messages::-webkit-scrollbar-track { background: transparent; }
 .chat-messages::-webkit-scrollbar-thumb { background: rgba(255, 255, 255, 0.1); border-radius: 3px; }
@@ -173,12 +532,6 @@ body {
 .message {
     display: flex;
     margin-bottom: var(--spacing-sm);
-    animation: messageSlide 0.2s ease-out;
-}
-
-@keyframes messageSlide {
-    from { opacity: 0; transform: translateY(10px); }
-    to { opacity: 1; transform: translateY(0); }
 }
 
 .message.incoming { justify-content: flex-start; }
@@ -377,6 +730,13 @@ body {
                         <div class="contact-status">Offline viewer - Double-click to open</div>
                     </div>
                 </div>
+                <div class="search-box">
+                    <input type="search" class="search-input" id="searchInput" placeholder="Search messages">
+                    <span class="search-count" id="searchCount"></span>
+                    <button class="search-nav" id="searchPrev" title="Older result (Enter)">&#9650;</button>
+                    <button class="search-nav" id="searchNext" title="Newer result (Shift+Enter)">&#9660;</button>
+                </div>
+                <input type="date" class="jump-to-date" id="jumpToDate" title="Jump to date">
             </div>
         </div>
 
@@ -397,27 +757,352 @@ body {
         </div>
     </div>
 
+CHAT_DATA
     <script>
-const CHAT_DATA = ''' + chat_data_js + ''';
+/**
+ * Windowed list: only the rows in the viewport plus a buffer are in the DOM
+ * Row heights start as estimates and are replaced by measurements once a row has been shown
+ */
+class VirtualList {
+    constructor(container, rowCount, renderRow, estimateRow) {
+        this.container = container;
+        this.rowCount = rowCount;
+        this.renderRow = renderRow;
+        this.buffer = 10;
+    
+        // Fenwick tree over row heights so offsets stay O(log n) as rows get measured
+        this.heights = new Float64Array(rowCount);
+        this.tree = new Float64Array(rowCount + 1);
+        for (let i = 0; i < rowCount; i++) {
+            this.heights[i] = estimateRow(i);
+            this.tree[i + 1] += this.heights[i];
+            const parent = (i + 1) + ((i + 1) & -(i + 1));
+            if (parent <= rowCount) this.tree[parent] += this.tree[i + 1];
+        }
+        this.topStep = 1;
+        while (this.topStep * 2 <= rowCount) this.topStep *= 2;
+    
+        this.rendered = new Map();
+        this.pool = [];
+        this.pinnedToBottom = false;
+        this.frame = null;
+    
+        this.spacer = document.createElement('div');
+        this.spacer.className = 'virtual-spacer';
+        container.innerHTML = '';
+        container.appendChild(this.spacer);
+    
+        // Images and fonts change row heights after they are first measured
+        this.resizeObserver = new ResizeObserver(() => this.schedule());
+        container.addEventListener('scroll', () => {
+            this.pinnedToBottom = container.scrollTop + container.clientHeight >= container.scrollHeight - 4;
+            this.schedule();
+        }, { passive: true });
+        window.addEventListener('resize', () => this.schedule());
+    }
+    
+    addHeight(index, delta) {
+        for (let i = index + 1; i <= this.rowCount; i += i & -i) this.tree[i] += delta;
+    }
+    
+    offsetOf(index) {
+        let offset = 0;
+        for (let i = index; i > 0; i -= i & -i) offset += this.tree[i];
+        return offset;
+    }
+    
+    indexAt(offset) {
+        let index = 0;
+        for (let step = this.topStep; step > 0; step >>= 1) {
+            if (index + step <= this.rowCount && this.tree[index + step] <= offset) {
+                index += step;
+                offset -= this.tree[index];
+            }
+        }
+        return Math.min(index, this.rowCount - 1);
+    }
+    
+    schedule() {
+        if (this.frame === null) {
+            this.frame = requestAnimationFrame(() => {
+                this.frame = null;
+                this.update();
+            });
+        }
+    }
+    
+    update() {
+        if (!this.rowCount) return;
+        const container = this.container;
+        const base = this.spacer.offsetTop;
+        const top = Math.max(0, container.scrollTop - base);
+        const anchor = this.indexAt(top);
+        const anchorDelta = top - this.offsetOf(anchor);
+        const first = Math.max(0, anchor - this.buffer);
+        const last = Math.min(this.rowCount - 1, this.indexAt(top + container.clientHeight) + this.buffer);
+    
+        // Recycle rows that left the window
+        for (const [index, row] of this.rendered) {
+            if (index < first || index > last) {
+                this.resizeObserver.unobserve(row);
+                row.remove();
+                this.pool.push(row);
+                this.rendered.delete(index);
+            }
+        }
+    
+        for (let index = first; index <= last; index++) {
+            if (this.rendered.has(index)) continue;
+            let row = this.pool.pop();
+            if (!row) {
+                row = document.createElement('div');
+                row.className = 'virtual-row';
+            }
+            row.innerHTML = this.renderRow(index);
+            this.spacer.appendChild(row);
+            this.rendered.set(index, row);
+            this.resizeObserver.observe(row);
+        }
+    
+        // Measure after all rows are in so layout is computed once
+        let changed = false;
+        for (const [index, row] of this.rendered) {
+            const height = row.offsetHeight;
+            if (height !== this.heights[index]) {
+                this.addHeight(index, height - this.heights[index]);
+                this.heights[index] = height;
+                changed = true;
+            }
+        }
+    
+        this.spacer.style.height = this.offsetOf(this.rowCount) + 'px';
+        for (const [index, row] of this.rendered) {
+            row.style.top = this.offsetOf(index) + 'px';
+        }
+    
+        // Keep the row at the top of the viewport still while estimates are corrected
+        if (this.pinnedToBottom) {
+            container.scrollTop = container.scrollHeight;
+        } else if (changed) {
+            container.scrollTop = base + this.offsetOf(anchor) + anchorDelta;
+        }
+        if (changed) this.schedule();
+    }
+    
+    scrollToIndex(index, margin = 0) {
+        // margin leaves that many pixels of earlier rows above the target
+        this.pinnedToBottom = false;
+        this.container.scrollTop = this.spacer.offsetTop + this.offsetOf(index) - margin;
+        this.update();
+    }
+    
+    refresh() {
+        // Re-render the rows in view, e.g. after the search highlight changed
+        for (const [index, row] of this.rendered) row.innerHTML = this.renderRow(index);
+        this.schedule();
+    }
+    
+    scrollToBottom() {
+        this.pinnedToBottom = true;
+        this.container.scrollTop = this.container.scrollHeight;
+        this.update();
+    }
+}
+
+// Row and media kinds of the render model from make_standalone.py
+const ROW_SEPARATOR = 0, ROW_SYSTEM = 1, ROW_MESSAGE = 2;
+const MEDIA_IMAGE = 1, MEDIA_VIDEO = 2, MEDIA_AUDIO = 3;
+
+class ChatData {
+    constructor() {
+        this.manifest = JSON.parse(document.getElementById('chat-manifest').textContent);
+        this.chunks = new Array(this.manifest.chunks.length);
+        // First row of each chunk, from the per-chunk row counts in the manifest
+        this.rowStarts = [];
+        this.rowCount = 0;
+        this.manifest.chunks.forEach((chunk) => {
+            this.rowStarts.push(this.rowCount);
+            this.rowCount += chunk.rows;
+        });
+    }
+    
+    getChunk(index) {
+        if (!this.chunks[index]) {
+            const element = document.getElementById('chat-chunk-' + index);
+            this.chunks[index] = JSON.parse(element.textContent);
+            element.textContent = '';
+        }
+        return this.chunks[index];
+    }
+    
+    chunkOfRow(row) {
+        let low = 0;
+        let high = this.rowStarts.length - 1;
+        while (low < high) {
+            const middle = (low + high + 1) >> 1;
+            if (this.rowStarts[middle] <= row) low = middle;
+            else high = middle - 1;
+        }
+        return low;
+    }
+    
+    getRow(row) {
+        const index = this.chunkOfRow(row);
+        return this.getChunk(index)[row - this.rowStarts[index]];
+    }
+    
+    findDay(day) {
+        // First row on or after the given YYYY-MM-DD day
+        const index = this.manifest.chunks.findIndex((chunk) => chunk.last !== null && chunk.last.slice(0, 10) >= day);
+        if (index < 0) return this.rowCount - 1;
+        const offset = this.getChunk(index).findIndex((row) => row[0] === ROW_SEPARATOR && row[1] >= day);
+        return this.rowStarts[index] + Math.max(offset, 0);
+    }
+}
+
+/**
+ * Prefix search over the index embedded by make_standalone.py
+ * Queries are normalized like the parser's normalize_text, then lowercased
+ */
+class SearchIndex {
+    constructor(element, rowCount) {
+        this.element = element;
+        this.rowCount = rowCount;
+        this.terms = null;
+    }
+    
+    load() {
+        // Decoded on first use, like the chat chunks
+        if (!this.terms) {
+            const data = JSON.parse(this.element.textContent);
+            this.element.textContent = '';
+            this.terms = data.terms;
+            this.postings = data.postings;
+            this.decoded = new Map();
+        }
+    }
+    
+    tokenize(text) {
+        const normalized = text.replace(/[\\u202f\\u00a0\\u2007]/g, ' ').replace(/[\\u200e\\u200f]/g, '')
+            .normalize('NFC').toLowerCase();
+        return (normalized.match(/[\\p{L}\\p{N}_]+/gu) || [])
+            .map((term) => term.length > 32 ? Array.from(term).slice(0, 32).join('') : term);
+    }
+    
+    rows(termIndex) {
+        let rows = this.decoded.get(termIndex);
+        if (!rows) {
+            const deltas = this.postings[termIndex].split('.');
+            rows = new Int32Array(deltas.length);
+            let row = 0;
+            deltas.forEach((delta, i) => {
+                row += parseInt(delta, 36);
+                rows[i] = row;
+            });
+            this.decoded.set(termIndex, rows);
+        }
+        return rows;
+    }
+    
+    lookup(term, prefix) {
+        // Terms are sorted by UTF-16 code unit, the order of JavaScript string comparison
+        let low = 0;
+        let high = this.terms.length;
+        while (low < high) {
+            const middle = (low + high) >> 1;
+            if (this.terms[middle] < term) low = middle + 1;
+            else high = middle;
+        }
+        if (!prefix) {
+            return this.terms[low] === term ? this.rows(low) : new Int32Array(0);
+        }
+        let end = low;
+        while (end < this.terms.length && this.terms[end].startsWith(term)) end++;
+        if (end - low <= 1) return end > low ? this.rows(low) : new Int32Array(0);
+        // A short prefix can match thousands of terms; every one counts. They are marked in
+        // one bitmap over the rows (sorted for free), and not cached like single terms
+        const seen = new Uint8Array(this.rowCount);
+        let count = 0;
+        for (let i = low; i < end; i++) {
+            const cached = this.decoded.get(i);
+            if (cached) {
+                for (const row of cached) {
+                    if (!seen[row]) { seen[row] = 1; count++; }
+                }
+                continue;
+            }
+            let row = 0;
+            for (const delta of this.postings[i].split('.')) {
+                row += parseInt(delta, 36);
+                if (!seen[row]) { seen[row] = 1; count++; }
+            }
+        }
+        const rows = new Int32Array(count);
+        for (let row = 0, n = 0; n < count && row < seen.length; row++) {
+            if (seen[row]) rows[n++] = row;
+        }
+        return rows;
+    }
+    
+    search(query) {
+        this.load();
+        const terms = this.tokenize(query);
+        if (!terms.length) return { terms, rows: new Int32Array(0) };
+        // Every term has to match (the last one as a prefix while typing); start from the shortest list
+        const lists = terms.map((term, i) => this.lookup(term, i === terms.length - 1 || term.length > 2))
+            .sort((a, b) => a.length - b.length);
+        let rows = lists[0];
+        lists.slice(1).forEach((list) => {
+            const other = new Set(list);
+            rows = rows.filter((row) => other.has(row));
+        });
+        return { terms, rows };
+    }
+}
 
 class WhatsAppChatViewer {
     constructor(config = {}) {
-        this.currentUserName = config.currentUserName || 'You';
+        this.currentUserName = config.currentUserName || null;
         this.mediaPath = config.mediaPath || 'media/';
         this.messagesContainer = document.getElementById('chatMessages');
+        this.jumpInput = document.getElementById('jumpToDate');
+        this.searchInput = document.getElementById('searchInput');
+        this.searchCount = document.getElementById('searchCount');
+        this.searchPrev = document.getElementById('searchPrev');
+        this.searchNext = document.getElementById('searchNext');
         this.lightbox = document.getElementById('lightbox');
         this.lightboxImage = document.getElementById('lightboxImage');
         this.lightboxVideo = document.getElementById('lightboxVideo');
         this.lightboxClose = document.getElementById('lightboxClose');
-        this.messages = CHAT_DATA;
-        this.lastDate = null;
+        this.data = new ChatData();
+        this.senders = this.data.manifest.senders;
+        // Outgoing flags were computed for the --me name; a different name here overrides them
+        this.meIndex = !this.currentUserName || this.currentUserName === this.data.manifest.me ? null
+            : this.senders.indexOf(this.escapeHtml(this.currentUserName));
+        const searchElement = document.getElementById('search-index');
+        this.search = searchElement ? new SearchIndex(searchElement, this.data.rowCount) : null;
+        this.results = [];
+        this.resultIndex = -1;
+        this.currentResultRow = -1;
+        this.highlightPattern = null;
+        this.today = this.dayKey(0);
+        this.yesterday = this.dayKey(-1);
         this.init();
     }
     
     init() {
         try {
-            this.renderMessages();
-            this.scrollToBottom();
+            // Only the rows around the viewport are rendered; chunks are decoded when reached
+            this.list = new VirtualList(this.messagesContainer, this.data.rowCount,
+                                        (index) => this.renderRow(this.data.getRow(index), index), () => 72);
+            // Chunks with a valid timestamp, for the date picker's range
+            const chunks = this.data.manifest.chunks.filter((chunk) => chunk.last !== null);
+            if (chunks.length) {
+                this.jumpInput.min = chunks[0].first.slice(0, 10);
+                this.jumpInput.max = chunks[chunks.length - 1].last.slice(0, 10);
+            }
+            if (!this.search) this.searchInput.parentElement.style.display = 'none';
+            this.list.scrollToBottom();
             this.setupEventListeners();
         } catch (error) {
             console.error('Failed to initialize:', error);
@@ -425,108 +1110,132 @@ class WhatsAppChatViewer {
         }
     }
     
-    renderMessages() {
-        this.messagesContainer.innerHTML = '';
-        this.messages.forEach((message) => {
-            this.renderMessage(message);
-        });
-    }
-    
-    renderMessage(message) {
-        const messageDate = this.parseDate(message.timestamp);
-        if (this.shouldShowDateSeparator(messageDate)) {
-            this.addDateSeparator(messageDate);
-            this.lastDate = messageDate;
-        }
-        
-        switch (message.type) {
-            case 'system':
-                this.renderSystemMessage(message);
-                break;
-            case 'text':
-            case 'media':
-                this.renderChatMessage(message);
-                break;
+    renderRow(row, index) {
+        switch (row[0]) {
+            case ROW_SEPARATOR: {
+                const label = row[1] === this.today ? 'TODAY' : row[1] === this.yesterday ? 'YESTERDAY' : row[2];
+                return `<div class="date-separator"><span>${label}</span></div>`;
+            }
+            case ROW_SYSTEM:
+                return `<div class="message-system${index === this.currentResultRow ? ' search-current' : ''}"><div class="system-content">${this.highlight(row[1])}</div></div>`;
+            case ROW_MESSAGE:
+                return this.renderChatMessage(row, index === this.currentResultRow);
         }
+        return '';
     }
     
-    shouldShowDateSeparator(currentDate) {
-        if (!this.lastDate) return true;
-        return currentDate.getFullYear() !== this.lastDate.getFullYear() ||
-               currentDate.getMonth() !== this.lastDate.getMonth() ||
-               currentDate.getDate() !== this.lastDate.getDate();
-    }
-    
-    addDateSeparator(date) {
-        const separator = document.createElement('div');
-        separator.className = 'date-separator';
-        const dateText = this.formatDateSeparator(date);
-        separator.innerHTML = `<span>${dateText}</span>`;
-        this.messagesContainer.appendChild(separator);
-    }
-    
-    renderSystemMessage(message) {
-        const systemMsg = document.createElement('div');
-        systemMsg.className = 'message-system';
-        systemMsg.innerHTML = `<div class="system-content">${this.escapeHtml(message.text)}</div>`;
-        this.messagesContainer.appendChild(systemMsg);
-    }
-    
-    renderChatMessage(message) {
-        const messageDiv = document.createElement('div');
-        const isOutgoing = message.sender === this.currentUserName;
-        messageDiv.className = `message ${isOutgoing ? 'outgoing' : 'incoming'}`;
-        
-        const bubble = document.createElement('div');
-        bubble.className = 'message-bubble';
+    renderChatMessage(row, current) {
+        const [, sender, outgoing, text, time, media, mediaKind, width, height, thumb] = row;
+        const isOutgoing = this.meIndex === null ? outgoing === 1 : sender === this.meIndex;
         
         let bubbleContent = '';
-        if (!isOutgoing && message.sender) {
-            bubbleContent += `<div class="message-sender">${this.escapeHtml(message.sender)}</div>`;
+        if (!isOutgoing && this.senders[sender]) {
+            bubbleContent += `<div class="message-sender">${this.senders[sender]}</div>`;
         }
-        if (message.media) {
-            bubbleContent += this.renderMedia(message.media);
+        if (media) {
+            bubbleContent += this.renderMedia(media, mediaKind, width, height, thumb);
         }
-        if (message.text) {
-            bubbleContent += `<div class="message-text">${this.escapeHtml(message.text)}</div>`;
+        if (text) {
+            bubbleContent += `<div class="message-text">${this.highlight(text)}</div>`;
         }
-        
-        const time = this.formatTime(message.timestamp);
         bubbleContent += `<div class="message-time">${time}</div>`;
         
-        bubble.innerHTML = bubbleContent;
-        messageDiv.appendChild(bubble);
-        this.messagesContainer.appendChild(messageDiv);
+        return `<div class="message ${isOutgoing ? 'outgoing' : 'incoming'}${current ? ' search-current' : ''}"><div class="message-bubble">${bubbleContent}</div></div>`;
     }
     
-    renderMedia(mediaFilename) {
-        const mediaUrl = this.mediaPath + mediaFilename;
-        const extension = this.getFileExtension(mediaFilename).toLowerCase();
-        
-        if (['jpg', 'jpeg', 'png', 'gif', 'webp'].includes(extension)) {
-            return `<div class="message-media" data-media="${mediaUrl}" data-type="image">
-                <img src="${mediaUrl}" alt="Media" loading="lazy" 
-                     onerror="this.parentElement.innerHTML='<div class=\\'media-not-found\\'>📷 Image not found: ${this.escapeHtml(mediaFilename)}</div>'">
-            </div>`;
+    renderMedia(media, mediaKind, width, height, thumb) {
+        // media is already HTML-escaped; a missing file swaps in its data-missing text
+        // Previews use the thumbnail when there is one; the lightbox opens the original
+        const mediaUrl = this.mediaPath + media;
+        const previewUrl = thumb ? this.mediaPath + thumb : mediaUrl;
+        const size = width ? `width="${width}" height="${height}"` : '';
+        if (mediaKind < 0) {
+            // Checked when the page was generated: the file is missing or empty
+            const labels = ['📎 File', '📷 Image', '🎥 Video', '🔊 Audio', '📎 File'];
+            return `<div class="media-not-found">${labels[-mediaKind]} not found: ${media}</div>`;
         }
+        const onError = 'onerror="const box = this.parentElement; box.className = &quot;media-not-found&quot;; box.textContent = box.dataset.missing"';
         
-        if (['mp4', 'avi', 'mov', 'webm'].includes(extension)) {
-            return `<div class="message-media" data-media="${mediaUrl}" data-type="video">
-                <video src="${mediaUrl}" onerror="this.parentElement.innerHTML='<div class=\\'media-not-found\\'>🎥 Video not found</div>'"></video>
+        switch (mediaKind) {
+            case MEDIA_IMAGE:
+                return `<div class="message-media" data-media="${mediaUrl}" data-type="image" data-missing="📷 Image not found: ${media}">
+                <img src="${previewUrl}" ${size} alt="Media" loading="lazy" decoding="async" ${onError}>
+            </div>`;
+            case MEDIA_VIDEO: {
+                // A poster image instead of a <video> element, so nothing is fetched until played
+                const preview = thumb
+                    ? `<img src="${previewUrl}" ${size} alt="Video" loading="lazy" decoding="async" ${onError}>`
+                    : `<video src="${mediaUrl}" preload="none" ${size} ${onError}></video>`;
+                return `<div class="message-media" data-media="${mediaUrl}" data-type="video" data-missing="🎥 Video not found: ${media}">
+                ${preview}
                 <div class="video-overlay"></div>
             </div>`;
-        }
-        
-        if (['opus', 'mp3', 'm4a', 'ogg', 'wav'].includes(extension)) {
-            return `<div class="audio-player">
-                <audio controls src="${mediaUrl}">Your browser does not support audio.</audio>
+            }
+            case MEDIA_AUDIO:
+                return `<div class="audio-player">
+                <audio controls preload="none" src="${mediaUrl}">Your browser does not support audio.</audio>
             </div>`;
         }
-        
-        return `<div class="media-not-found">📎 File: ${this.escapeHtml(mediaFilename)}</div>`;
+        return `<div class="media-not-found">📎 File: ${media}</div>`;
+    }
+    
+    highlight(html) {
+        if (!this.highlightPattern) return html;
+        // Text is already escaped: only mark the parts between entities such as &amp;
+        return html.split(/(&[^;]+;)/).map((part, i) => i % 2 ? part : part.replace(this.highlightPattern, '<mark>$&</mark>')).join('');
+    }
+    
+    runSearch(query) {
+        const { terms, rows } = this.search.search(query);
+        this.results = rows;
+        // Longest terms first so a term that prefixes another doesn't cut its highlight short
+        this.highlightPattern = terms.length ? new RegExp(terms.slice().sort((a, b) => b.length - a.length).join('|'), 'giu') : null;
+        // Start at the newest result, like the chat itself
+        this.resultIndex = rows.length - 1;
+        this.showResult();
+    }
+    
+    stepResult(step) {
+        const count = this.results.length;
+        if (!count) return;
+        this.resultIndex = (this.resultIndex + step + count) % count;
+        this.showResult();
+    }
+    
+    showResult() {
+        const count = this.results.length;
+        this.searchCount.textContent = !this.searchInput.value.trim() ? '' : count ? `${this.resultIndex + 1} / ${count}` : 'No results';
+        this.currentResultRow = count ? this.results[this.resultIndex] : -1;
+        this.list.refresh();
+        if (count) this.list.scrollToIndex(this.currentResultRow, this.messagesContainer.clientHeight / 3);
     }
     
     setupEventListeners() {
+        if (this.search) {
+            let timer = null;
+            this.searchInput.addEventListener('input', () => {
+                clearTimeout(timer);
+                timer = setTimeout(() => this.runSearch(this.searchInput.value), 150);
+            });
+            this.searchInput.addEventListener('keydown', (e) => {
+                if (e.key === 'Enter') {
+                    // Enter goes to the next older result, Shift+Enter back to newer ones
+                    clearTimeout(timer);
+                    if (this.highlightPattern === null) this.runSearch(this.searchInput.value);
+                    else this.stepResult(e.shiftKey ? 1 : -1);
+                } else if (e.key === 'Escape') {
+                    this.searchInput.value = '';
+                    this.runSearch('');
+                }
+            });
+            this.searchPrev.addEventListener('click', () => this.stepResult(-1));
+            this.searchNext.addEventListener('click', () => this.stepResult(1));
+        }
+        
+        this.jumpInput.addEventListener('change', () => {
+            if (this.jumpInput.value) this.list.scrollToIndex(this.data.findDay(this.jumpInput.value));
+        });
+    
         this.messagesContainer.addEventListener('click', (e) => {
             const mediaElement = e.target.closest('.message-media');
             if (mediaElement) {
@@ -535,12 +1244,12 @@ class WhatsAppChatViewer {
                 this.openLightbox(mediaUrl, mediaType);
             }
         });
-        
+    
         this.lightboxClose.addEventListener('click', () => this.closeLightbox());
         this.lightbox.addEventListener('click', (e) => {
             if (e.target === this.lightbox) this.closeLightbox();
         });
-        
+    
         document.addEventListener('keydown', (e) => {
             if (e.key === 'Escape' && this.lightbox.classList.contains('active')) {
                 this.closeLightbox();
@@ -568,66 +1277,30 @@ class WhatsAppChatViewer {
         this.lightboxVideo.pause();
     }
     
-    scrollToBottom() {
-        this.messagesContainer.scrollTop = this.messagesContainer.scrollHeight;
-    }
-    
     showError(message) {
         this.messagesContainer.innerHTML = `<div class="loading" style="color: #ff4444;">⚠️ ${message}</div>`;
     }
     
-    parseDate(timestamp) {
-        return new Date(timestamp);
-    }
-    
-    formatDateSeparator(date) {
-        const today = new Date();
-        const yesterday = new Date(today);
-        yesterday.setDate(yesterday.getDate() - 1);
-        
-        if (this.isSameDay(date, today)) return 'TODAY';
-        if (this.isSameDay(date, yesterday)) return 'YESTERDAY';
-        
-        const options = { month: 'long', day: 'numeric', year: 'numeric' };
-        return date.toLocaleDateString('en-US', options).toUpperCase();
-    }
-    
-    isSameDay(date1, date2) {
-        return date1.getFullYear() === date2.getFullYear() &&
-               date1.getMonth() === date2.getMonth() &&
-               date1.getDate() === date2.getDate();
-    }
-    
-    formatTime(timestamp) {
-        const date = this.parseDate(timestamp);
-        if (isNaN(date.getTime())) return 'Invalid time';
-        
-        let hours = date.getHours();
-        const minutes = date.getMinutes();
-        const ampm = hours >= 12 ? 'PM' : 'AM';
-        hours = hours % 12;
-        hours = hours ? hours : 12;
-        const minutesStr = minutes < 10 ? '0' + minutes : minutes;
-        return `${hours}:${minutesStr} ${ampm}`;
-    }
-    
-    getFileExtension(filename) {
-        const parts = filename.split('.');
-        return parts.length > 1 ? parts.pop() : '';
+    dayKey(offset) {
+        // Local YYYY-MM-DD, for labelling today's and yesterday's separators
+        const date = new Date();
+        date.setDate(date.getDate() + offset);
+        const month = String(date.getMonth() + 1).padStart(2, '0');
+        const day = String(date.getDate()).padStart(2, '0');
+        return `${date.getFullYear()}-${month}-${day}`;
     }
     
     escapeHtml(text) {
-        const div = document.createElement('div');
-        div.textContent = text;
-        return div.innerHTML;
+        return text.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;')
+                   .replace(/"/g, '&quot;').replace(/'/g, '&#x27;');
     }
 }
 
 document.addEventListener('DOMContentLoaded', () => {
-    // IMPORTANT: Change 'You' to YOUR name as it appears in the chat
-    // This determines which messages go on the right (green) side
+    // Messages from the --me name given to make_standalone.py go on the right (green) side
+    // Set currentUserName to your name as it appears in the chat to override it here
     const config = {
-        currentUserName: 'You',  // Change this to your name!
+        currentUserName: null,
         mediaPath: 'media/'
     };
     new WhatsAppChatViewer(config);
@@ -637,30 +1310,80 @@ document.addEventListener('DOMContentLoaded', () => {
 </html>
 '''
     
-    # Write the output HTML file
+    head, tail = html_template.split('CHAT_DATA')
+    if isinstance(chat_source, str):
+        if not os.path.exists(chat_source):
+            print(f"❌ Error: {chat_source} not found!")
+            print("   Make sure you've run parser.py first to generate chat.json")
+            sys.exit(1)
+        source_name = chat_source
+        messages = iter_chat_file(chat_source)
+    else:
+        source_name = 'parser'
+        messages = chat_source
+    if media_files is not None:
+        # Mark references to files that are not in the media folder
+        from media_tools import MediaValidator
+        messages = MediaValidator.from_manifest(media_files).annotate(messages)
+    if profile:
+        # Reading and decoding the input (or parsing an export) as the chunks pull messages
+        messages = profile.timed_iter(messages, 'read')
+    
+    # Stream head, chunks and tail into a temporary file so a failure leaves no half-written viewer
+    temp_path = output_path + '.tmp'
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_template)
-        print(f"✓ Generated standalone HTML: {output_path}")
-        print(f"\n🎉 Success! You can now:")
-        print(f"   1. Double-click '{output_path}' to open it")
-        print(f"   2. No server needed!")
-        print(f"   3. Make sure 'media/' folder is in the same directory")
-        print(f"\n💡 Tip: You can rename the file or move it anywhere (keep media/ folder with it)")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(head)
+            count = write_chunks(f, messages, me, media_files, search, profile)
+            f.write(tail)
+        os.replace(temp_path, output_path)
+    except json.JSONDecodeError as e:
+        print(f"❌ Error: Invalid JSON in {source_name}")
+        print(f"   {e}")
+        sys.exit(1)
     except Exception as e:
         print(f"❌ Error writing output file: {e}")
         sys.exit(1)
-
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    
+    print(f"✓ Embedded {count} messages from {source_name}")
+    print(f"✓ Generated standalone HTML: {output_path}")
+    print(f"\n🎉 Success! You can now:")
+    print(f"   1. Double-click '{output_path}' to open it")
+    print(f"   2. No server needed!")
+    print(f"   3. Make sure 'media/' folder is in the same directory")
+    print(f"\n💡 Tip: You can rename the file or move it anywhere (keep media/ folder with it)")
 
 def main():
+    import argparse
+    from profiling import add_profile_arguments, profile_from_args
+    
+    arg_parser = argparse.ArgumentParser(description='Generate a standalone HTML viewer from parsed chat data')
+    arg_parser.add_argument('input', nargs='?', default='chat.json',
+                            help='chat.json, a .jsonl or .sqlite file from parser.py, or an export .txt/.zip (default: chat.json)')
+    arg_parser.add_argument('output', nargs='?', default='whatsapp_viewer.html',
+                            help='Output HTML file (default: whatsapp_viewer.html)')
+    arg_parser.add_argument('--me', default='You',
+                            help="Your name as it appears in the chat; your messages go on the right (default: You)")
+    arg_parser.add_argument('--media-dir', default='media',
+                            help='Media folder to build previews from; attachments of a .zip input are extracted here (default: media)')
+    arg_parser.add_argument('--no-thumbnails', action='store_true',
+                            help='Show original media files instead of generated previews')
+    arg_parser.add_argument('--no-search', action='store_true',
+                            help='Leave out the search index (smaller file)')
+    add_profile_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    
     print("=" * 60)
     print("WhatsApp Standalone HTML Generator")
     print("=" * 60)
     print()
     
-    # Check if chat.json exists
-    if not os.path.exists('chat.json'):
-        print("❌ chat.json not found!")
+    # Check if the input exists
+    if not os.path.exists(args.input):
+        print(f"❌ {args.input} not found!")
         print("\n📋 Steps to fix:")
         print("   1. Make sure you're in the correct folder")
         print("   2. Run parser.py first to generate chat.json:")
@@ -668,9 +1391,43 @@ def main():
         print()
         sys.exit(1)
     
+    profile = profile_from_args(args)
+    if profile:
+        profile.start()
+    stage = profile.stage if profile else lambda name: nullcontext()
+    
+    # Describe the media folder; unchanged files come from the cache in media/.thumbs
+    chat_source = args.input
+    media_files = None
+    zip_input = args.input.lower().endswith('.zip')
+    if zip_input:
+        # Media stays in the archive; only the attachments the chat references are extracted,
+        # found by a quick pass over the chat and described in a process pool
+        from parser import WhatsAppParser
+        from media_tools import ZipMediaLibrary
+        library = ZipMediaLibrary(args.input, args.media_dir, thumbnails=not args.no_thumbnails)
+        with stage('media'):
+            media_files = library.refresh()
+            library.prepare(WhatsAppParser(args.input).iter_media_names())
+        chat_source = library.extract_referenced(iter_chat_file(args.input))
+    elif os.path.isdir(args.media_dir):
+        from media_tools import MediaLibrary
+        library = MediaLibrary(args.media_dir, thumbnails=not args.no_thumbnails)
+        with stage('media'):
+            media_files = library.refresh()
+        thumbs = sum(1 for info in media_files.values() if info.get('thumb'))
+        print(f"✓ Scanned {len(media_files)} media files ({library.processed} new or changed, {thumbs} thumbnails)")
+    
     # Generate the standalone HTML
-    output_filename = 'whatsapp_viewer.html'
-    generate_standalone_html('chat.json', output_filename)
+    generate_standalone_html(chat_source, args.output, me=args.me, media_files=media_files,
+                             search=not args.no_search, profile=profile)
+    if zip_input:
+        thumbs = sum(1 for info in media_files.values() if info.get('thumb'))
+        print(f"✓ Extracted {library.extracted} of {len(media_files)} attachments to {args.media_dir} "
+              f"({library.processed} new or changed, {thumbs} thumbnails)")
+    if profile:
+        profile.stop()
+        profile.save(args.profile)
     
     print("\n" + "=" * 60)
 
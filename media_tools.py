@@ -0,0 +1,621 @@
+#!/usr/bin/env python3
+"""
+WhatsApp Media Tools
+Builds a manifest of the media folder (size, mime, dimensions, duration) and small
+thumbnails/posters, so the viewer shows previews and only loads originals in the lightbox
+"""
+
+import os
+import sys
+import json
+import shutil
+import struct
+import zipfile
+import calendar
+import hashlib
+import mimetypes
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    # Pillow is optional - image sizes then come from file headers and thumbnails from ffmpeg
+    Image = None
+
+THUMB_DIR = '.thumbs'
+THUMB_SIZE = 320
+INDEX_FILE = 'index.json'
+HASH_CACHE_FILE = 'hashes.json'
+INDEX_VERSION = 1
+HASH_BLOCK = 1 << 20
+FFMPEG = shutil.which('ffmpeg')
+FFPROBE = shutil.which('ffprobe')
+# Recorded in the index so files without a preview are retried once a tool is installed
+THUMBNAIL_TOOLS = [name for name, available in (('pillow', Image), ('ffmpeg', FFMPEG)) if available]
+
+# media_status values set by MediaValidator
+MEDIA_OK, MEDIA_MISSING, MEDIA_EMPTY = 'ok', 'missing', 'empty'
+
+# Types WhatsApp uses that mimetypes does not know everywhere
+EXTRA_TYPES = {'.opus': 'audio/ogg', '.webp': 'image/webp', '.m4a': 'audio/mp4', '.3gp': 'video/3gpp'}
+
+
+def guess_mime(name: str) -> str:
+    """MIME type from the file extension"""
+    extension = os.path.splitext(name)[1].lower()
+    return EXTRA_TYPES.get(extension) or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def file_hash(path: str) -> str:
+    """SHA-1 of the file contents; names thumbnails so identical files share one"""
+    with open(path, 'rb') as f:
+        return stream_hash(f)
+
+
+def stream_hash(f) -> str:
+    """SHA-1 of everything left in a binary file object"""
+    digest = hashlib.sha1()
+    for block in iter(lambda: f.read(HASH_BLOCK), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def member_hash(zip_path: str, member: str) -> str:
+    """SHA-1 of a zip member, decompressed on the fly (runs in a worker thread)"""
+    with zipfile.ZipFile(zip_path) as archive, archive.open(member) as f:
+        return stream_hash(f)
+
+
+def zip_attachments(archive: zipfile.ZipFile) -> Dict[str, zipfile.ZipInfo]:
+    """Attachments of an export zip by file name: every member except the chat text"""
+    from parser import find_chat_member
+    chat_member = find_chat_member(archive)
+    members = {}
+    for info in archive.infolist():
+        # Exports are flat; the basename also keeps members from escaping the media folder
+        name = os.path.basename(info.filename)
+        if not info.is_dir() and info.filename != chat_member and name and not name.startswith('.'):
+            members[name] = info
+    return members
+
+
+def member_stat(info: zipfile.ZipInfo) -> SimpleNamespace:
+    """Size and mtime of a zip member in the shape of os.stat_result (the zip stores local time)"""
+    mtime_ns = calendar.timegm(info.date_time + (0, 0, 0)) * 1_000_000_000
+    return SimpleNamespace(st_size=info.file_size, st_mtime_ns=mtime_ns)
+
+
+def image_size(path: str) -> Optional[Tuple[int, int]]:
+    """
+    (width, height) read from a PNG, GIF, WebP or JPEG header without decoding the image
+    Returns None for anything else
+    """
+    with open(path, 'rb') as f:
+        head = f.read(32)
+        if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24])
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', head[6:10])
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            chunk = head[12:16]
+            if chunk == b'VP8 ':
+                width, height = struct.unpack('<HH', head[26:30])
+                return width & 0x3fff, height & 0x3fff
+            if chunk == b'VP8L':
+                bits = int.from_bytes(head[21:25], 'little')
+                return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+            if chunk == b'VP8X':
+                return int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1
+            return None
+        if head[:2] != b'\xff\xd8':
+            return None
+
+        # JPEG: walk the segments up to the first start-of-frame
+        f.seek(2)
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            code = marker[1]
+            while code == 0xFF:
+                # Fill bytes before the marker code
+                byte = f.read(1)
+                if not byte:
+                    return None
+                code = byte[0]
+            if code == 0x01 or 0xD0 <= code <= 0xD8:
+                continue
+            length = f.read(2)
+            if len(length) < 2:
+                return None
+            if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+                frame = f.read(5)
+                if len(frame) < 5:
+                    return None
+                height, width = struct.unpack('>HH', frame[1:5])
+                return width, height
+            f.seek(struct.unpack('>H', length)[0] - 2, os.SEEK_CUR)
+
+
+def probe_stream(path: str) -> Dict:
+    """Width, height and duration of a video or audio file via ffprobe, when installed"""
+    if not FFPROBE:
+        return {}
+    try:
+        output = subprocess.run(
+            [FFPROBE, '-v', 'error', '-print_format', 'json',
+             '-show_entries', 'stream=codec_type,width,height:format=duration', path],
+            capture_output=True, text=True, timeout=60, check=True,
+        ).stdout
+        data = json.loads(output)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return {}
+
+    info = {}
+    duration = data.get('format', {}).get('duration')
+    if duration:
+        info['duration'] = round(float(duration), 1)
+    for stream in data.get('streams', []):
+        if stream.get('codec_type') == 'video' and stream.get('width'):
+            info['width'] = stream['width']
+            info['height'] = stream['height']
+            break
+    return info
+
+
+def make_thumbnail(path: str, kind: str, target: str, size: int = THUMB_SIZE) -> bool:
+    """Write a JPEG preview of an image or a poster frame of a video to target"""
+    temp = target + '.tmp'
+    try:
+        if kind == 'image' and Image is not None:
+            with Image.open(path) as image:
+                # Let the JPEG decoder downscale while decoding
+                image.draft('RGB', (size, size))
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((size, size))
+                image.convert('RGB').save(temp, 'JPEG', quality=75, optimize=True)
+        elif FFMPEG and kind in ('image', 'video'):
+            scale = f'scale={size}:{size}:force_original_aspect_ratio=decrease'
+            # A frame one second in avoids black fade-ins; very short clips fall back to the first frame
+            for seek in (['-ss', '1'], []) if kind == 'video' else ([],):
+                subprocess.run(
+                    [FFMPEG, '-v', 'error', '-y', *seek, '-i', path, '-frames:v', '1',
+                     '-vf', scale, '-f', 'image2', '-c:v', 'mjpeg', temp],
+                    capture_output=True, timeout=120,
+                )
+                if os.path.exists(temp) and os.path.getsize(temp):
+                    break
+            else:
+                return False
+        else:
+            return False
+        os.replace(temp, target)
+        return True
+    except (OSError, ValueError, subprocess.SubprocessError):
+        if os.path.exists(temp):
+            os.remove(temp)
+        return False
+
+
+def describe_file(path: str, size: int, thumb_dir: Optional[str]) -> Dict:
+    """
+    Manifest entry for one file (runs in a worker process)
+    thumb_dir None skips the thumbnail
+    """
+    mime = guess_mime(path)
+    kind = mime.partition('/')[0]
+    info = {'size': size, 'mime': mime, 'hash': file_hash(path)}
+
+    if kind == 'image':
+        dimensions = None
+        if Image is not None:
+            try:
+                with Image.open(path) as image:
+                    dimensions = image.size
+                    # EXIF orientations 5-8 are rotated by 90 degrees when displayed
+                    if image.getexif().get(0x0112) in (5, 6, 7, 8):
+                        dimensions = dimensions[::-1]
+            except (OSError, ValueError):
+                pass
+        if dimensions is None:
+            dimensions = image_size(path)
+        if dimensions:
+            info['width'], info['height'] = dimensions
+    elif kind in ('video', 'audio'):
+        info.update(probe_stream(path))
+
+    if thumb_dir is not None and kind in ('image', 'video'):
+        thumb = f"{info['hash']}.jpg"
+        target = os.path.join(thumb_dir, thumb)
+        # Keyed by content hash, so renamed or duplicate files reuse the same preview
+        if os.path.exists(target) or make_thumbnail(path, kind, target):
+            info['thumb'] = f"{THUMB_DIR}/{thumb}"
+        else:
+            info['thumb'] = None
+    return info
+
+
+class MediaLibrary:
+    """
+    Manifest of a media folder: size, mime, dimensions, duration and thumbnail per file
+    Entries are cached in .thumbs/index.json and reused while a file's size and mtime are unchanged
+    """
+
+    def __init__(self, media_dir: str = 'media', thumbnails: bool = True, workers: Optional[int] = None):
+        self.media_dir = media_dir
+        self.thumb_dir = os.path.join(media_dir, THUMB_DIR)
+        self.index_file = os.path.join(self.thumb_dir, INDEX_FILE)
+        self.thumbnails = thumbnails
+        self.workers = workers
+        self.files: Dict[str, Dict] = {}
+        self.processed = 0
+        self.retry_previews = False
+
+    def load_index(self) -> Dict[str, Dict]:
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if index.get('version') != INDEX_VERSION:
+            return {}
+        self.retry_previews = index.get('tools') != THUMBNAIL_TOOLS
+        return index.get('files', {})
+
+    def save_index(self):
+        os.makedirs(self.thumb_dir, exist_ok=True)
+        temp = self.index_file + '.tmp'
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'tools': THUMBNAIL_TOOLS, 'files': self.files}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp, self.index_file)
+
+    def is_current(self, entry: Optional[Dict], stat: os.stat_result) -> bool:
+        """Whether a cached entry still describes the file"""
+        if not entry or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+            return False
+        if not self.thumbnails or entry['mime'].partition('/')[0] not in ('image', 'video'):
+            return True
+        # Thumbnails were not attempted last time, or the preview was deleted since
+        if 'thumb' not in entry:
+            return False
+        if entry['thumb'] is None:
+            return not self.retry_previews
+        return os.path.exists(os.path.join(self.media_dir, entry['thumb']))
+
+    def refresh(self) -> Dict[str, Dict]:
+        """Scan the folder once, describe new or changed files in a process pool and save the index"""
+        cached = self.load_index()
+        files = {}
+        pending: List[Tuple[str, os.stat_result]] = []
+        with os.scandir(self.media_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if self.is_current(cached.get(entry.name), stat):
+                    files[entry.name] = cached[entry.name]
+                else:
+                    pending.append((entry.name, stat))
+
+        self.files = files
+        self.describe(pending)
+        self.processed = len(pending)
+        if pending or len(files) != len(cached) or self.retry_previews:
+            self.save_index()
+        return files
+
+    def describe(self, pending: List[Tuple[str, os.stat_result]]):
+        """Describe files of media_dir (name, stat) into self.files, in a process pool if there are several"""
+        if not pending:
+            return
+        thumb_dir = self.thumb_dir if self.thumbnails else None
+        if thumb_dir:
+            os.makedirs(thumb_dir, exist_ok=True)
+        paths = [os.path.join(self.media_dir, name) for name, _ in pending]
+        sizes = [stat.st_size for _, stat in pending]
+        if self.workers == 1 or len(pending) == 1:
+            described = list(map(describe_file, paths, sizes, [thumb_dir] * len(paths)))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                described = list(executor.map(describe_file, paths, sizes, [thumb_dir] * len(paths),
+                                              chunksize=16))
+        for (name, stat), info in zip(pending, described):
+            info['mtime_ns'] = stat.st_mtime_ns
+            self.files[name] = info
+
+    def get(self, name: str) -> Optional[Dict]:
+        return self.files.get(name)
+
+
+class ZipMediaLibrary(MediaLibrary):
+    """
+    Manifest of the attachments inside an export zip, listed from the archive directory
+    An attachment is only extracted into media_dir, and described, once a message references it
+    Extracted files keep the member's mtime, so MediaLibrary(media_dir) reuses the same index
+    """
+
+    def __init__(self, zip_path: str, media_dir: str = 'media', thumbnails: bool = True,
+                 workers: Optional[int] = None):
+        super().__init__(media_dir, thumbnails, workers)
+        self.zip_path = zip_path
+        self.members: Dict[str, zipfile.ZipInfo] = {}
+        self.extracted = 0
+
+    def refresh(self) -> Dict[str, Dict]:
+        """
+        List the attachments without extracting anything
+        Entries not described before only have size, mime and mtime until extract_referenced reaches them
+        """
+        cached = self.load_index()
+        with zipfile.ZipFile(self.zip_path) as archive:
+            self.members = zip_attachments(archive)
+        files = {}
+        for name, info in self.members.items():
+            stat = member_stat(info)
+            entry = cached.get(name)
+            if self.is_current(entry, stat):
+                files[name] = entry
+            else:
+                files[name] = {'size': stat.st_size, 'mime': guess_mime(name), 'mtime_ns': stat.st_mtime_ns}
+        self.files = files
+        return files
+
+    def extract(self, archive: zipfile.ZipFile, name: str):
+        """Write one attachment to media_dir unless an intact copy is already there"""
+        info = self.members[name]
+        path = os.path.join(self.media_dir, name)
+        stat = member_stat(info)
+        try:
+            current = os.stat(path)
+            if current.st_size == stat.st_size and current.st_mtime_ns == stat.st_mtime_ns:
+                return
+        except OSError:
+            pass
+        os.makedirs(self.media_dir, exist_ok=True)
+        # Hidden while incomplete, so folder scans never see a partial file
+        temp = os.path.join(self.media_dir, f".{name}.tmp")
+        with archive.open(info) as source, open(temp, 'wb') as target:
+            shutil.copyfileobj(source, target, HASH_BLOCK)
+        os.utime(temp, ns=(stat.st_mtime_ns, stat.st_mtime_ns))
+        os.replace(temp, path)
+        self.extracted += 1
+
+    def prepare(self, names: Iterable[str]):
+        """
+        Extract the named attachments (see WhatsAppParser.iter_media_names) and describe the
+        new ones in a process pool, like MediaLibrary.refresh, before the chat is streamed
+        """
+        pending = []
+        with zipfile.ZipFile(self.zip_path) as archive:
+            for name in dict.fromkeys(names):
+                if name not in self.members:
+                    continue
+                self.extract(archive, name)
+                if 'hash' not in self.files[name]:
+                    pending.append((name, member_stat(self.members[name])))
+        self.describe(pending)
+        self.processed += len(pending)
+
+    def extract_referenced(self, messages: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Yield the messages, extracting and describing each attachment the first time one references it
+        The entries in the dict refresh() returned are completed before the message is yielded;
+        attachments no message references are never written to disk
+        After prepare() this only picks up attachments it did not see
+        """
+        thumb_dir = self.thumb_dir if self.thumbnails else None
+        seen = set()
+        with zipfile.ZipFile(self.zip_path) as archive:
+            for message in messages:
+                name = message.get('media')
+                if name and name not in seen and name in self.members:
+                    seen.add(name)
+                    self.extract(archive, name)
+                    entry = self.files[name]
+                    if 'hash' not in entry:
+                        if thumb_dir:
+                            os.makedirs(thumb_dir, exist_ok=True)
+                        info = describe_file(os.path.join(self.media_dir, name), entry['size'], thumb_dir)
+                        info['mtime_ns'] = entry['mtime_ns']
+                        self.files[name] = info
+                        self.processed += 1
+                yield message
+        if self.processed or self.retry_previews:
+            self.save_index()
+
+
+class MediaValidator:
+    """
+    Checks the media a chat references against one scan of the media folder
+    Optional hashing (for duplicates) runs in a thread pool and is cached by size and mtime
+    """
+
+    def __init__(self, media_dir: Optional[str] = 'media', files: Optional[Dict[str, Tuple[int, int]]] = None,
+                 workers: int = 8):
+        self.media_dir = media_dir
+        self.workers = workers
+        # name -> (size, mtime_ns); pass files to reuse a scan that was already done
+        self.files = files if files is not None else self.scan()
+        self.hashes: Dict[str, str] = {}
+        # Set by from_zip: files are then read from the archive instead of media_dir
+        self.zip_path: Optional[str] = None
+        self.members: Dict[str, str] = {}
+
+    @classmethod
+    def from_manifest(cls, manifest: Dict[str, Dict], media_dir: Optional[str] = None) -> 'MediaValidator':
+        """Validator over the files of a MediaLibrary manifest, without scanning again"""
+        return cls(media_dir, {name: (info['size'], info['mtime_ns']) for name, info in manifest.items()})
+
+    @classmethod
+    def from_zip(cls, zip_path: str, workers: int = 8) -> 'MediaValidator':
+        """Validator over the attachments of an export zip, from the archive directory alone"""
+        with zipfile.ZipFile(zip_path) as archive:
+            members = zip_attachments(archive)
+        files = {}
+        for name, info in members.items():
+            stat = member_stat(info)
+            files[name] = (stat.st_size, stat.st_mtime_ns)
+        validator = cls(None, files, workers)
+        validator.zip_path = zip_path
+        validator.members = {name: info.filename for name, info in members.items()}
+        return validator
+
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        files = {}
+        with os.scandir(self.media_dir) as entries:
+            for entry in entries:
+                if not entry.name.startswith('.') and entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def status(self, name: str) -> str:
+        entry = self.files.get(name)
+        if entry is None:
+            return MEDIA_MISSING
+        return MEDIA_EMPTY if entry[0] == 0 else MEDIA_OK
+
+    def annotate(self, messages: Iterable[Dict]) -> Iterator[Dict]:
+        """Yield the messages, with media_status set on those that reference a file"""
+        status = self.status
+        for message in messages:
+            if message.get('media'):
+                message['media_status'] = status(message['media'])
+            yield message
+
+    def hash_files(self, names: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """SHA-1 of the given (default: all) present files, reusing cached hashes of unchanged files"""
+        # Zip members are hashed from the archive and not cached: there is no folder to keep a cache in
+        cache_file = os.path.join(self.media_dir, THUMB_DIR, HASH_CACHE_FILE) if self.media_dir else None
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, TypeError, ValueError):
+            cache = {}
+
+        names = [name for name in (self.files if names is None else names) if name in self.files]
+        pending = []
+        for name in names:
+            cached = cache.get(name)
+            if cached and tuple(cached[:2]) == self.files[name]:
+                self.hashes[name] = cached[2]
+            else:
+                pending.append(name)
+
+        if pending:
+            # Hashing is I/O bound and hashlib releases the GIL, so threads are enough
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                if self.zip_path:
+                    members = [self.members[name] for name in pending]
+                    digests = executor.map(member_hash, [self.zip_path] * len(members), members)
+                else:
+                    digests = executor.map(file_hash, [os.path.join(self.media_dir, name) for name in pending])
+                for name, digest in zip(pending, digests):
+                    self.hashes[name] = digest
+            if cache_file:
+                cache.update({name: [*self.files[name], self.hashes[name]] for name in pending})
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                with open(cache_file + '.tmp', 'w', encoding='utf-8') as f:
+                    json.dump(cache, f, ensure_ascii=False, separators=(',', ':'))
+                os.replace(cache_file + '.tmp', cache_file)
+        return {name: self.hashes[name] for name in names}
+
+    def duplicates(self, names: Optional[Iterable[str]] = None) -> List[List[str]]:
+        """Groups of files with identical contents"""
+        groups: Dict[str, List[str]] = {}
+        for name, digest in self.hash_files(names).items():
+            groups.setdefault(digest, []).append(name)
+        return sorted(sorted(group) for group in groups.values() if len(group) > 1)
+
+    def report(self, names: Iterable[str]) -> Dict[str, List[str]]:
+        """Referenced files by status, plus present files no message references"""
+        referenced = set(names)
+        report = {MEDIA_OK: [], MEDIA_MISSING: [], MEDIA_EMPTY: []}
+        for name in sorted(referenced):
+            report[self.status(name)].append(name)
+        report['unused'] = sorted(set(self.files).difference(referenced))
+        return report
+
+
+def main():
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description='Build the media manifest and thumbnails for a chat')
+    arg_parser.add_argument('chat_file', nargs='?',
+                            help='Parser output (.json, .jsonl, .sqlite) to check media references against, '
+                                 'or an export .zip to take both the chat and the media from')
+    arg_parser.add_argument('--media-dir', default='media', help='Media folder (default: media)')
+    arg_parser.add_argument('--no-thumbnails', action='store_true', help='Only build the manifest')
+    arg_parser.add_argument('--check-only', action='store_true',
+                            help='Only validate the references; no manifest or thumbnails')
+    arg_parser.add_argument('--hash', action='store_true', help='Hash referenced files to find duplicates')
+    arg_parser.add_argument('--annotate', metavar='OUTPUT',
+                            help='Write the chat with a media_status on each media message (.json or .jsonl)')
+    arg_parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes for new files (default: all cores)')
+    args = arg_parser.parse_args()
+
+    from parser import is_zip_export
+    from make_standalone import iter_chat_file
+    zip_export = bool(args.chat_file) and is_zip_export(args.chat_file)
+    if not zip_export and not os.path.isdir(args.media_dir):
+        print(f"❌ Media folder not found: {args.media_dir}")
+        sys.exit(1)
+
+    names = None
+    if args.check_only:
+        # A zip is checked from its directory; nothing is extracted
+        validator = MediaValidator.from_zip(args.chat_file) if zip_export else MediaValidator(args.media_dir)
+    else:
+        if zip_export:
+            library = ZipMediaLibrary(args.chat_file, args.media_dir, thumbnails=not args.no_thumbnails)
+            files = library.refresh()
+            # Only what the chat references is extracted into the media folder
+            names = {message['media'] for message in library.extract_referenced(iter_chat_file(args.chat_file))
+                     if message.get('media')}
+            print(f"✓ {len(files)} attachments in {args.chat_file}, {library.extracted} extracted to {args.media_dir} "
+                  f"({library.processed} new or changed)")
+        else:
+            library = MediaLibrary(args.media_dir, thumbnails=not args.no_thumbnails, workers=args.workers)
+            files = library.refresh()
+            print(f"✓ {len(files)} media files ({library.processed} new or changed, {len(files) - library.processed} cached)")
+        thumbs = sum(1 for info in files.values() if info.get('thumb'))
+        if not args.no_thumbnails:
+            print(f"✓ {thumbs} thumbnails in {library.thumb_dir}")
+            if Image is None and FFMPEG is None:
+                print("  Install Pillow or ffmpeg to generate thumbnails")
+        validator = MediaValidator.from_manifest(files, args.media_dir)
+
+    if not args.chat_file:
+        return
+
+    if names is None:
+        names = {message['media'] for message in iter_chat_file(args.chat_file) if message.get('media')}
+    report = validator.report(names)
+    print(f"✓ {len(names)} referenced files: {len(report[MEDIA_OK])} ok, "
+          f"{len(report[MEDIA_MISSING])} missing, {len(report[MEDIA_EMPTY])} empty")
+    for name in (report[MEDIA_MISSING] + report[MEDIA_EMPTY])[:10]:
+        print(f"  {validator.status(name)}: {name}")
+    print(f"✓ {len(report['unused'])} files not referenced by the chat")
+
+    if args.hash:
+        duplicates = validator.duplicates(report[MEDIA_OK])
+        print(f"✓ {len(duplicates)} groups of duplicate files "
+              f"({sum(len(group) - 1 for group in duplicates)} redundant copies)")
+        for group in duplicates[:10]:
+            print(f"  {', '.join(group)}")
+
+    if args.annotate:
+        from parser import open_writer
+        fmt = 'jsonl' if args.annotate.lower().endswith('.jsonl') else 'json'
+        with open_writer(args.annotate, fmt) as writer:
+            for message in validator.annotate(iter_chat_file(args.chat_file)):
+                writer.write(message)
+        print(f"✓ Wrote {writer.count} messages with media_status to {args.annotate}")
+
+
+if __name__ == '__main__':
+    main()
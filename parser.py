@@ -5,72 +5,400 @@ Converts WhatsApp Android .txt exports to structured JSON
 Handles multiline messages, media attachments, system messages, and Unicode normalization
 """
 
+import io
+import os
 import re
 import json
+import mmap
+import hashlib
+import sqlite3
+import zipfile
+import warnings
 import unicodedata
-from datetime import datetime
-from typing import List, Dict, Optional
+from array import array
+from enum import IntEnum
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from collections import Counter, deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Iterator, Optional, Tuple
+
+def is_zip_export(path: str) -> bool:
+    """Whether path is the .zip WhatsApp's "Export chat" produces (read in place, never extracted)"""
+    return path.lower().endswith('.zip')
+
+
+def find_chat_member(archive: zipfile.ZipFile) -> str:
+    """Name of the chat text inside an export zip (_chat.txt on iOS, 'WhatsApp Chat with ...' on Android)"""
+    texts = [info for info in archive.infolist()
+             if not info.is_dir() and info.filename.lower().endswith('.txt')]
+    if not texts:
+        raise ValueError(f"No chat .txt in {archive.filename}")
+    for info in texts:
+        name = os.path.basename(info.filename)
+        if name == '_chat.txt' or name.startswith('WhatsApp Chat'):
+            return info.filename
+    return max(texts, key=lambda info: info.file_size).filename
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize Unicode spaces and direction marks, then apply NFC
+    Pure ASCII lines (the vast majority) only need the strip
+    """
+    if not text.isascii():
+        # U+202F (narrow no-break space) before am/pm is on every header line
+        # of newer exports, so handle it first; the line is usually ASCII after
+        text = text.replace('\u202f', ' ').replace('\xa0', ' ')
+        if not text.isascii():
+            # Figure space, and the LRM/RLM direction marks newer exports add
+            text = text.replace('\u2007', ' ').replace('\u200e', '').replace('\u200f', '')
+            # Skip the NFC rebuild when the text is already normalized
+            if not unicodedata.is_normalized('NFC', text):
+                text = unicodedata.normalize('NFC', text)
+    return text.strip()
+
+
+# Day number of 1970-01-01, for epoch conversion without datetime objects
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=1024)
+def _parse_day(date_str: str, date_order: str = 'dmy') -> Tuple[str, int]:
+    """Convert DD/MM/YYYY (or MM/DD/YY, ...) to (ISO date, epoch seconds at midnight)"""
+    first, second, year = map(int, date_str.replace('.', '/').replace('-', '/').split('/'))
+    day, month = (first, second) if date_order == 'dmy' else (second, first)
+    if year < 100:
+        year += 2000
+    day_date = date(year, month, day)
+    return day_date.isoformat(), (day_date.toordinal() - EPOCH_ORDINAL) * 86400
+
+
+@lru_cache(maxsize=4096)
+def convert_timestamp(date_str: str, time_str: str, period: str,
+                      date_order: str = 'dmy') -> Tuple[str, Optional[int]]:
+    """
+    Convert DD/MM/YYYY, H:MM[:SS] am/pm to (ISO-8601 timestamp, epoch seconds)
+    An empty period means a 24-hour clock; date_order 'mdy' reads MM/DD dates
+    Consecutive messages usually share a minute, so results are memoized;
+    the date part is cached separately per day
+    Epoch seconds treat the export's wall-clock time as UTC (exports carry no zone)
+    """
+    period = period.lower()
+    try:
+        day_iso, day_epoch = _parse_day(date_str, date_order)
+        hour, minute, *seconds = map(int, time_str.split(':'))
+        second = seconds[0] if seconds else 0
+        
+        # Convert to 24-hour format
+        if period == 'pm' and hour != 12:
+            hour += 12
+        elif period == 'am' and hour == 12:
+            hour = 0
+        if not (0 <= hour < 24 and 0 <= minute < 60 and 0 <= second < 60) or len(seconds) > 1:
+            raise ValueError('time out of range')
+        
+        timestamp = f"{day_iso}T{hour:02d}:{minute:02d}:{second:02d}"
+        return timestamp, day_epoch + hour * 3600 + minute * 60 + second
+    except (ValueError, IndexError):
+        # Fallback for malformed timestamps
+        return f"Invalid timestamp: {date_str} {time_str} {period}", None
+
+
+# ISO-8601 prefixes accepted by --since/--until: 2025, 2025-11, 2025-11-18, 2025-11-18T09:30, ...
+ISO_PREFIX_PATTERN = re.compile(r'\d{4}(?:-\d{2}(?:-\d{2}(?:T\d{2}(?::\d{2}(?::\d{2})?)?)?)?)?')
+
+
+def iso_prefix(value: str) -> str:
+    """Check a --since/--until bound; a space between date and time is read as 'T'"""
+    value = value.strip().replace(' ', 'T', 1)
+    if not ISO_PREFIX_PATTERN.fullmatch(value):
+        raise ValueError(f"not an ISO-8601 date or date-time: {value}")
+    return value
+
+
+# Where a day stands against the date-range filter (DAY_OUTSIDE: just after it, or no valid date)
+DAY_BEFORE, DAY_WANTED, DAY_OUTSIDE, DAY_PAST = range(4)
+
+
+def guess_date_order(dates: List[str]) -> str:
+    """
+    Decide between DD/MM and MM/DD from a sample of header dates
+    A field above 12 settles it; otherwise pick the order that keeps the dates ascending
+    """
+    fields = [tuple(map(int, d.replace('.', '/').replace('-', '/').split('/'))) for d in dates]
+    if any(first > 12 for first, _, _ in fields):
+        return 'dmy'
+    if any(second > 12 for _, second, _ in fields):
+        return 'mdy'
+    
+    def backward_steps(order: str) -> int:
+        keys = [(y, m, d) if order == 'dmy' else (y, d, m) for d, m, y in fields]
+        return sum(1 for a, b in zip(keys, keys[1:]) if b < a)
+    
+    return 'mdy' if backward_steps('mdy') < backward_steps('dmy') else 'dmy'
+
+
+class MessageBuffer:
+    """
+    Text of the message being built once it has continuation lines, joined once when the
+    message is finished (appending to the text line by line is quadratic in the line count)
+    With max_lines/max_chars, lines past a cap are counted and dropped or, with spill_dir,
+    streamed to <spill_dir>/<name>.txt, so memory stays bounded by the caps
+    """
+    __slots__ = ('parts', 'chars', 'dropped', 'spill', 'spill_path',
+                 'max_lines', 'max_chars', 'spill_dir', 'name')
+    
+    def __init__(self, text: str, name: str, max_lines: Optional[int] = None,
+                 max_chars: Optional[int] = None, spill_dir: Optional[str] = None):
+        self.parts = [text] if text else []
+        self.chars = len(text)
+        # Lines that did not fit, and the sidecar file they went to
+        self.dropped = 0
+        self.spill = None
+        self.spill_path = None
+        self.max_lines = max_lines
+        self.max_chars = max_chars
+        self.spill_dir = spill_dir
+        self.name = name
+    
+    def add(self, line: str):
+        """Append one normalized, non-blank continuation line"""
+        if self.dropped:
+            self.overflow(line)
+        elif ((self.max_lines and len(self.parts) >= self.max_lines)
+              or (self.max_chars and self.chars + len(line) + 1 > self.max_chars)):
+            self.overflow(line)
+        else:
+            self.parts.append(line)
+            self.chars += len(line) + 1
+    
+    def extend(self, lines: List[str]):
+        if self.max_lines or self.max_chars:
+            for line in lines:
+                self.add(line)
+        else:
+            self.parts.extend(lines)
+    
+    def overflow(self, line: str):
+        self.dropped += 1
+        if self.spill_dir is None:
+            return
+        if self.spill is None:
+            # The sidecar gets the whole message: what was kept, then everything after it
+            self.open_spill('\n'.join(self.parts))
+        if self.parts or self.dropped > 1:
+            self.spill.write('\n')
+        self.spill.write(line)
+    
+    def open_spill(self, text: str):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self.spill_path = os.path.join(self.spill_dir, f"{self.name}.txt")
+        self.spill = open(self.spill_path, 'w', encoding='utf-8', newline='\n')
+        self.spill.write(text)
+    
+    def finish(self, message: Dict) -> bool:
+        """Put the joined text into message; True if a cap cut it short"""
+        text = '\n'.join(self.parts)
+        cut = bool(self.max_chars) and len(text) > self.max_chars
+        if cut and self.spill_dir is not None and self.spill is None:
+            # A single line longer than max_chars
+            self.open_spill(text)
+        if self.spill is not None:
+            self.spill.close()
+            message['overflow_file'] = self.spill_path
+        if cut:
+            text = text[:self.max_chars]
+        if self.dropped or cut:
+            if self.spill_path:
+                marker = f"[… full message in {self.spill_path}]"
+            elif self.dropped:
+                marker = f"[… {self.dropped:,} more lines cut]"
+            else:
+                marker = f"[… cut at {self.max_chars:,} characters]"
+            text = f"{text}\n{marker}" if text else marker
+        message['text'] = text
+        return cut or bool(self.dropped)
+    
+    def discard(self):
+        """Drop the message (an empty one), including any sidecar file"""
+        if self.spill is not None:
+            self.spill.close()
+            os.remove(self.spill_path)
+
 
 class WhatsAppParser:
     # Timestamp pattern: DD/MM/YYYY, H:MM am|pm
     # Must account for optional Unicode spaces before am/pm
     TIMESTAMP_PATTERN = re.compile(
-        r'^(\d{1,2}/\d{1,2}/\d{4}),\s+(\d{1,2}:\d{2})\s*([ap]m)\s*-\s*(.*)$',
+        r'^(\d{1,2}/\d{1,2}/\d{2,4}),\s+(\d{1,2}:\d{2})\s*([ap]m)\s*-\s*(.*)$',
         re.IGNORECASE
     )
     
+    # Header layouts of the export flavours we know about, all with the groups
+    # (date, time, period, sender_and_text); the period is empty for 24-hour clocks
+    CHAT_FORMATS = {
+        # 18/11/2025, 11:31 am - Sender: text   (Android, 12-hour)
+        'android': TIMESTAMP_PATTERN,
+        # 18/11/2025, 23:31 - Sender: text      (Android, 24-hour)
+        'android24': re.compile(
+            r'^(\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}),?\s+(\d{1,2}:\d{2})()\s*-\s*(.*)$'
+        ),
+        # [18/11/25, 11:31:05 PM] Sender: text  (iOS, 12- or 24-hour)
+        'ios': re.compile(
+            r'^\[(\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}),?\s+(\d{1,2}:\d{2}(?::\d{2})?)\s*((?:[ap]m)?)\]\s*(.*)$',
+            re.IGNORECASE
+        ),
+    }
+    
+    # Every header layout starts with its date (after normalize_text); used to skip
+    # lines of filtered-out messages without parsing them
+    DATE_PREFIX_PATTERN = re.compile(r'\s*\[?(\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4})')
+    
+    # A line break followed by a line that may be a header: optional ASCII blanks and '[',
+    # then a digit or any non-ASCII byte (Unicode spaces, direction marks and non-ASCII
+    # digits are sorted out after decoding). Cuts the mapped file into one piece per message
+    SEGMENT_PATTERN = re.compile(rb'\n(?=[ \t\f\v]*\[?[0-9\x80-\xff])')
+    # The same, also breaking at a bare CR; slower, so only used for files that have one
+    CR_SEGMENT_PATTERN = re.compile(rb'[\n\r](?=[ \t\f\v]*\[?[0-9\x80-\xff])')
+    BARE_CR_PATTERN = re.compile(rb'\r(?!\n)')
+    
+    # Number of leading lines sampled to pick the format
+    DETECT_SAMPLE_LINES = 1000
+    # Bytes checked to pick the encoding; bad bytes are replaced per message either way
+    ENCODING_SAMPLE_BYTES = 1 << 20
+    # A well-formed UTF-8 multibyte character, and any byte outside ASCII
+    UTF8_SEQUENCE_PATTERN = re.compile(rb'[\xc2-\xdf][\x80-\xbf]|[\xe0-\xef][\x80-\xbf]{2}|[\xf0-\xf4][\x80-\xbf]{3}')
+    NON_ASCII_PATTERN = re.compile(rb'[\x80-\xff]')
+    # The mapped file is cut into messages a block of about this size at a time
+    SEGMENT_BLOCK_BYTES = 1 << 20
+    # iter_messages_parallel: byte size of a chunk at most (before aligning to headers),
+    # and chunks parsed or waiting per worker
+    PARALLEL_CHUNK_BYTES = 4 << 20
+    PARALLEL_CHUNKS_PER_WORKER = 2
+    
     # Media attachment patterns
     MEDIA_PATTERN = re.compile(r'(.*?)\s*\(file attached\)\s*$', re.IGNORECASE)
+    IOS_MEDIA_PATTERN = re.compile(r'<attached:\s*(.+?)>$', re.IGNORECASE)
+    MEDIA_EXTENSIONS = frozenset([
+        'jpg', 'jpeg', 'png', 'webp', 'gif', 'mp4', 'avi', 'mov',
+        'opus', 'mp3', 'm4a', 'pdf', 'doc', 'docx',
+    ])
     
-    def __init__(self, chat_file: str):
+    # System messages, matched in one pass from the start of the payload:
+    # - the encryption notice
+    # - group events, whose phrase comes before any colon ("Bob changed the subject ...")
+    # - deletion notices that replace a message body ("Bob: This message was deleted")
+    # Plain words like "added" or "left" inside a "Sender: text" message don't count;
+    # events built around them ("Alice added Bob") have no colon and are caught anyway
+    SYSTEM_PATTERN = re.compile(
+        r"""Messages\ and\ calls\ are\ end-to-end\ encrypted
+          | [^:]*?\b(?:created\ group|changed\ the\ subject|changed\ this\ group's\ icon
+                     |changed\ the\ group\ description)\b
+          | [^:]*:\s*(?:You\ deleted\ this\ message|This\ message\ was\ deleted)\.?\s*$
+        """,
+        re.IGNORECASE | re.VERBOSE
+    )
+    # iOS puts U+200E (left-to-right mark) at the start of every body it writes itself:
+    # group events and the encryption notice (after the group's name), deletion notices,
+    # attachments. Found on the raw line, as normalize_text drops the mark
+    MARKED_BODY_PATTERN = re.compile(r'[\]-][^:\]]*:\s*\u200e')
+    
+    def __init__(self, chat_file: str, include_epoch: bool = False,
+                 chat_format: Optional[str] = None, date_order: Optional[str] = None,
+                 since: Optional[str] = None, until: Optional[str] = None,
+                 sender: Optional[str] = None, msg_type: Optional[str] = None,
+                 encoding: Optional[str] = None, max_message_lines: Optional[int] = None,
+                 max_message_chars: Optional[int] = None, spill_dir: Optional[str] = None):
         self.chat_file = chat_file
+        # A .zip export is read in place: the chat text is streamed from this member
+        self.chat_member = None
+        if is_zip_export(chat_file):
+            with zipfile.ZipFile(chat_file) as archive:
+                self.chat_member = find_chat_member(archive)
+        # Export flavour (a CHAT_FORMATS key) and 'dmy'/'mdy'; None = detect from the file
+        self.chat_format = chat_format
+        self.date_order = date_order
+        self.timestamp_pattern = self.CHAT_FORMATS[chat_format or 'android']
+        # Add an integer 'epoch' field next to the ISO timestamp
+        self.include_epoch = include_epoch
+        # Text encoding of the export; None = UTF-8 unless the start of the file is not
+        self.encoding = encoding
+        # Byte offsets of the messages (or lines) whose undecodable bytes were replaced with U+FFFD
+        self.decode_errors: List[int] = []
         self.messages: List[Dict] = []
         self.current_message: Optional[Dict] = None
+        # Continuation lines of current_message, once it has some
+        self.buffer: Optional[MessageBuffer] = None
+        # Caps on one message's text; lines past them are dropped or spilled to spill_dir
+        if any(cap is not None and cap < 1 for cap in (max_message_lines, max_message_chars)):
+            raise ValueError("max_message_lines and max_message_chars must be at least 1")
+        self.max_message_lines = max_message_lines
+        self.max_message_chars = max_message_chars
+        self.spill_dir = spill_dir
+        # Sidecar names start with the chat's name and a hash of its path, so several
+        # chats can share one spill_dir
+        chat_path = os.path.abspath(chat_file)
+        self.spill_prefix = (f"{os.path.splitext(os.path.basename(chat_path))[0]}-"
+                             f"{hashlib.sha256(chat_path.encode('utf-8')).hexdigest()[:8]}")
+        # Messages cut short by the caps
+        self.capped_messages = 0
+        # Byte offsets of the line being read and of the current message's header line
+        self.line_offset = 0
+        self.message_offset = 0
+        # Filters (inclusive ISO-8601 prefixes, exact sender name and type), applied while parsing
+        self.since = iso_prefix(since) if since else None
+        self.until = iso_prefix(until) if until else None
+        self.sender = normalize_text(sender) if sender is not None else None
+        self.msg_type = msg_type
+        self.filtering = bool(self.since or self.until or self.sender is not None or msg_type)
+        # Verdict per raw date string, so each day is judged once
+        self.day_verdicts: Dict[str, int] = {}
+        # Set once the chat has reached the date range, then once it has moved past
+        # --until again; reading stops there
+        self.reached_range = False
+        self.past_until = False
+    
+    def open_chat(self):
+        """Binary file object over the chat text, decompressed on the fly for a .zip export"""
+        if self.chat_member is None:
+            return open(self.chat_file, 'rb')
+        # The member keeps the archive file open until it is closed itself
+        with zipfile.ZipFile(self.chat_file) as archive:
+            member = archive.open(self.chat_member)
+        # ZipExtFile reads lines in Python; a large buffer in front makes iteration ~3x faster
+        return io.BufferedReader(member, 1 << 20)
+    
+    def chat_size(self) -> int:
+        """Size of the chat text in bytes (uncompressed for a .zip export)"""
+        if self.chat_member is None:
+            return os.path.getsize(self.chat_file)
+        with zipfile.ZipFile(self.chat_file) as archive:
+            return archive.getinfo(self.chat_member).file_size
     
     def normalize_text(self, text: str) -> str:
         """Normalize Unicode characters, especially U+202F (narrow no-break space)"""
-        # Replace U+202F and other non-breaking spaces with regular space
-        text = text.replace('\u202f', ' ')
-        text = text.replace('\xa0', ' ')
-        # Normalize Unicode to NFC form
-        text = unicodedata.normalize('NFC', text)
-        return text.strip()
+        return normalize_text(text)
+    
+    # Cached converter returning (ISO-8601 string, epoch seconds or None)
+    convert_timestamp = staticmethod(convert_timestamp)
     
     def parse_timestamp(self, date_str: str, time_str: str, period: str) -> str:
         """Convert DD/MM/YYYY, H:MM am/pm to ISO-8601 timestamp"""
-        try:
-            # Parse date
-            day, month, year = map(int, date_str.split('/'))
-            
-            # Parse time
-            hour, minute = map(int, time_str.split(':'))
-            
-            # Convert to 24-hour format
-            period = period.lower()
-            if period == 'pm' and hour != 12:
-                hour += 12
-            elif period == 'am' and hour == 12:
-                hour = 0
-            
-            # Create datetime and convert to ISO format
-            dt = datetime(year, month, day, hour, minute, 0)
-            return dt.isoformat()
-        except (ValueError, IndexError) as e:
-            # Fallback for malformed timestamps
-            return f"Invalid timestamp: {date_str} {time_str} {period}"
+        return self.convert_timestamp(date_str, time_str, period, self.date_order or 'dmy')[0]
     
     def extract_media(self, text: str) -> tuple[str, Optional[str]]:
         """
         Extract media filename from message text
         Returns: (remaining_text, media_filename)
         """
-        match = self.MEDIA_PATTERN.match(text)
+        match = self.MEDIA_PATTERN.match(text) or self.IOS_MEDIA_PATTERN.match(text)
         if match:
             media_filename = match.group(1).strip()
             # Check if it's a valid media file
-            if any(media_filename.lower().endswith(ext) for ext in 
-                   ['.jpg', '.jpeg', '.png', '.webp', '.gif', '.mp4', 
-                    '.avi', '.mov', '.opus', '.mp3', '.m4a', '.pdf', '.doc', '.docx']):
+            _, dot, extension = media_filename.rpartition('.')
+            if dot and extension.lower() in self.MEDIA_EXTENSIONS:
                 return '', media_filename
         return text, None
     
@@ -80,156 +408,1232 @@ class WhatsAppParser:
         System messages don't have a "Sender: " format
         """
         # If there's no colon, it's likely a system message
-        if ':' not in sender_and_text:
+        if ':' not in sender_and_text or self.SYSTEM_PATTERN.match(sender_and_text):
             return True, sender_and_text.strip()
-        
-        # Check for common system message patterns
-        system_patterns = [
-            'Messages and calls are end-to-end encrypted',
-            'created group',
-            'added',
-            'removed',
-            'left',
-            'changed the subject',
-            'changed this group\'s icon',
-            'You deleted this message',
-            'This message was deleted',
-        ]
-        
-        for pattern in system_patterns:
-            if pattern.lower() in sender_and_text.lower():
-                return True, sender_and_text.strip()
-        
         return False, sender_and_text
     
-    def parse_message_line(self, sender_and_text: str) -> tuple[Optional[str], str, str, Optional[str]]:
+    def parse_message_line(self, sender_and_text: str, marked: bool = False) -> tuple[Optional[str], str, str, Optional[str]]:
         """
         Parse sender and message content
+        marked: the text after "Name: " started with U+200E (see MARKED_BODY_PATTERN)
         Returns: (sender, message_type, text, media_filename)
         """
+        sender, colon, text = sender_and_text.partition(':')
+        
         # Check if system message
-        is_system, text = self.is_system_message(sender_and_text)
+        if not colon or self.SYSTEM_PATTERN.match(sender_and_text):
+            return None, 'system', sender_and_text.strip(), None
         
-        if is_system:
-            return None, 'system', text, None
+        sender = sender.strip()
+        text = text.strip()
         
-        # Split sender and text
-        if ':' in sender_and_text:
-            sender, text = sender_and_text.split(':', 1)
-            sender = sender.strip()
-            text = text.strip()
-        else:
-            # Edge case: no colon found
-            return None, 'system', sender_and_text.strip(), None
+        # An iOS event ("Trip Group: \u200eAlice added Bob") comes after the group's name;
+        # marked bodies with a colon ("Location: ...") or ending in "omitted" (media left
+        # out of the export) are regular messages
+        if marked and (':' not in text and not text.endswith(' omitted') or self.SYSTEM_PATTERN.match(text)):
+            text, media = self.extract_media(text)
+            if media:
+                return sender, 'media', text, media
+            return None, 'system', text, None
         
-        # Check for media
-        text, media = self.extract_media(text)
+        # Check for media (only attachments end with ')' or, on iOS, '>')
+        if text.endswith((')', '>')):
+            text, media = self.extract_media(text)
+            if media:
+                return sender, 'media', text, media
         
-        if media:
-            return sender, 'media', text, media
-        elif text:
+        if text:
             return sender, 'text', text, None
         else:
             # Empty message - will be filtered out
             return sender, 'empty', '', None
     
+    def day_verdict(self, date_str: str) -> int:
+        """
+        DAY_WANTED if the day overlaps the date range, DAY_BEFORE or DAY_OUTSIDE if not,
+        and DAY_PAST once the day before it is after --until too (a one-day margin for clock changes)
+        """
+        verdict = self.day_verdicts.get(date_str)
+        if verdict is None:
+            last_day = self.until[:10] + '\uffff' if self.until else None
+            try:
+                day, _ = _parse_day(date_str, self.date_order)
+            except ValueError:
+                # Becomes an invalid timestamp, which a date range never matches
+                verdict = DAY_OUTSIDE
+            else:
+                if self.since and day < self.since[:10]:
+                    verdict = DAY_BEFORE
+                elif last_day and day > last_day:
+                    day_before = (date.fromisoformat(day) - timedelta(days=1)).isoformat()
+                    verdict = DAY_PAST if day_before > last_day else DAY_OUTSIDE
+                else:
+                    verdict = DAY_WANTED
+            self.day_verdicts[date_str] = verdict
+        return verdict
+    
+    def wanted_day(self, date_str: str) -> bool:
+        """Whether a header's day is in the date range; notes when reading can stop"""
+        verdict = self.day_verdict(date_str)
+        if verdict == DAY_PAST:
+            # Exports run in time order, but a stray line (or a clock change) can carry
+            # a later date, so only stop after the chat has been up to the range
+            self.past_until = self.reached_range
+        elif verdict != DAY_OUTSIDE:
+            self.reached_range = True
+        return verdict == DAY_WANTED
+    
+    def may_start_message(self, line: str) -> bool:
+        """
+        Cheap check on a raw line while no message is being built: False means the line
+        is neither a header nor of a wanted day, so it can be dropped unparsed
+        """
+        if not line.isascii():
+            # Direction marks and odd spaces can sit before or inside the date
+            line = normalize_text(line)
+        match = self.DATE_PREFIX_PATTERN.match(line)
+        if match is None:
+            return False
+        return not (self.since or self.until) or self.wanted_day(match.group(1))
+    
+    def wanted_header(self, date_str: str, sender_and_text: str) -> bool:
+        """Filters decidable from the header fields alone, before any conversion"""
+        if (self.since or self.until) and not self.wanted_day(date_str):
+            return False
+        # parse_message_line takes the sender from before the first colon
+        return self.sender is None or sender_and_text.partition(':')[0].strip() == self.sender
+    
+    def wanted_message(self, timestamp: str, epoch: Optional[int], sender: Optional[str], msg_type: str) -> bool:
+        """The exact filter check on a classified message"""
+        if self.sender is not None and sender != self.sender:
+            return False
+        if self.msg_type and msg_type != self.msg_type:
+            return False
+        if self.since or self.until:
+            if epoch is None:
+                return False
+            if self.since and timestamp < self.since:
+                return False
+            # Any time on a bare date still counts as that date
+            if self.until and timestamp > self.until + '\uffff':
+                return False
+        return True
+    
+    def start_buffer(self) -> MessageBuffer:
+        """Collect the current message's continuation lines from now on"""
+        self.buffer = MessageBuffer(
+            self.current_message['text'], f"{self.spill_prefix}-message-{self.message_offset}",
+            self.max_message_lines, self.max_message_chars, self.spill_dir,
+        )
+        return self.buffer
+    
+    def pop_current_message(self) -> Optional[Dict]:
+        """Detach the current message and return it if it should be kept"""
+        message = self.current_message
+        buffer = self.buffer
+        if buffer is None and message and self.max_message_chars and len(message['text']) > self.max_message_chars:
+            # One very long line
+            buffer = self.start_buffer()
+        self.current_message = None
+        if buffer is not None:
+            self.buffer = None
+            if message['type'] == 'empty':
+                buffer.discard()
+            elif buffer.finish(message):
+                self.capped_messages += 1
+        if message and message['type'] != 'empty':
+            # Clean up empty text for media-only messages
+            if message['type'] == 'media' and not message['text']:
+                message['text'] = ''
+            return message
+        return None
+    
     def finalize_current_message(self):
         """Add current message to messages list if valid"""
-        if self.current_message and self.current_message['type'] != 'empty':
-            # Clean up empty text for media-only messages
-            if self.current_message['type'] == 'media' and not self.current_message['text']:
-                self.current_message['text'] = ''
-            self.messages.append(self.current_message)
-        self.current_message = None
+        message = self.pop_current_message()
+        if message:
+            self.messages.append(message)
     
-    def parse(self) -> List[Dict]:
-        """Parse the WhatsApp chat file"""
-        try:
-            with open(self.chat_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-        except UnicodeDecodeError:
-            # Try with different encoding
-            with open(self.chat_file, 'r', encoding='latin-1') as f:
-                lines = f.readlines()
-        
-        for line in lines:
-            # Normalize Unicode
-            line = self.normalize_text(line)
+    def process_line(self, line: str) -> Optional[Dict]:
+        """
+        Feed one raw line to the parser
+        Returns the previous message once a new timestamp line completes it
+        """
+        # With filters, a line that cannot start a wanted message is dropped before any
+        # parsing when nothing is being built (the previous message was filtered out)
+        if self.filtering and self.current_message is None and not self.may_start_message(line):
+            return None
+        
+        # Normalize Unicode (keeping the raw line for MARKED_BODY_PATTERN)
+        raw_line = line
+        line = self.normalize_text(line)
+        
+        # Skip completely empty lines
+        if not line:
+            return None
+        
+        # Try to match timestamp pattern
+        match = self.timestamp_pattern.match(line)
+        
+        if match:
+            # Finalize previous message
+            finished = self.pop_current_message()
+            self.message_offset = self.line_offset
             
-            # Skip completely empty lines
-            if not line:
-                continue
+            # Extract components
+            date_str, time_str, period, sender_and_text = match.groups()
+            # A filtered-out message is dropped together with its continuation lines
+            if self.filtering and not self.wanted_header(date_str, sender_and_text):
+                return finished
             
-            # Try to match timestamp pattern
-            match = self.TIMESTAMP_PATTERN.match(line)
+            # Parse message content
+            marked = not raw_line.isascii() and self.MARKED_BODY_PATTERN.search(raw_line) is not None
+            sender, msg_type, text, media = self.parse_message_line(sender_and_text, marked)
             
-            if match:
-                # Finalize previous message
-                self.finalize_current_message()
-                
-                # Extract components
-                date_str = match.group(1)
-                time_str = match.group(2)
-                period = match.group(3)
-                sender_and_text = match.group(4)
-                
-                # Parse timestamp
-                timestamp = self.parse_timestamp(date_str, time_str, period)
-                
-                # Parse message content
-                sender, msg_type, text, media = self.parse_message_line(sender_and_text)
-                
-                # Create new message
-                self.current_message = {
-                    'timestamp': timestamp,
-                    'sender': sender,
-                    'type': msg_type,
-                    'text': text,
-                    'media': media
-                }
-            else:
-                # Continuation of previous message (multiline)
-                if self.current_message:
-                    # Append to existing text with newline
-                    if self.current_message['text']:
-                        self.current_message['text'] += '\n' + line
-                    else:
-                        self.current_message['text'] = line
+            # Parse timestamp
+            timestamp, epoch = self.convert_timestamp(date_str, time_str, period, self.date_order)
+            if self.filtering and not self.wanted_message(timestamp, epoch, sender, msg_type):
+                return finished
+            
+            # Create new message
+            self.current_message = {
+                'timestamp': timestamp,
+                'sender': sender,
+                'type': msg_type,
+                'text': text,
+                'media': media
+            }
+            if self.include_epoch:
+                self.current_message['epoch'] = epoch
+            return finished
         
-        # Finalize last message
-        self.finalize_current_message()
+        # Continuation of previous message (multiline)
+        if self.current_message:
+            (self.buffer or self.start_buffer()).add(line)
+        return None
+    
+    def detect_encoding(self, start: int = 0) -> str:
+        """
+        Pick the file encoding from the first ENCODING_SAMPLE_BYTES (from start)
+        UTF-8 unless the sample has bytes outside ASCII and not one of them forms a UTF-8
+        character (a latin-1 export); stray bad bytes in a UTF-8 file only affect their own
+        messages (see decode_replacing)
+        """
+        if self.encoding:
+            return self.encoding
+        with self.open_chat() as f:
+            f.seek(start)
+            sample = f.read(self.ENCODING_SAMPLE_BYTES)
+        if self.NON_ASCII_PATTERN.search(sample) and not self.UTF8_SEQUENCE_PATTERN.search(sample):
+            return 'latin-1'
+        return 'utf-8'
+    
+    def decode_replacing(self, raw: bytes, offset: int, encoding: str) -> str:
+        """Decode bytes that are not valid in encoding, replacing the bad ones, and remember where"""
+        self.decode_errors.append(offset)
+        return raw.decode(encoding, 'replace')
+    
+    def warn_decode_errors(self, encoding: str):
+        """One warning per parse for all messages that had undecodable bytes"""
+        if self.decode_errors:
+            warnings.warn(
+                f"{self.chat_file}: {len(self.decode_errors)} messages had bytes that are not valid "
+                f"{encoding} (first at byte {self.decode_errors[0]}); they were replaced with U+FFFD",
+                UnicodeWarning, stacklevel=2,
+            )
+    
+    def detect_format(self, encoding: str):
+        """
+        Pick the export flavour and date order once, from the first lines of the file
+        Only the winning pattern is used for the rest of the parse
+        """
+        sample = self.sample_lines(encoding)
         
+        if self.chat_format is None:
+            hits = {
+                name: sum(1 for line in sample if pattern.match(line))
+                for name, pattern in self.CHAT_FORMATS.items()
+            }
+            # Ties (including no matches at all) keep the Android default
+            self.chat_format = max(hits, key=hits.get)
+            self.timestamp_pattern = self.CHAT_FORMATS[self.chat_format]
+        
+        if self.date_order is None:
+            dates = [m.group(1) for m in map(self.timestamp_pattern.match, sample) if m]
+            self.date_order = guess_date_order(dates)
+    
+    def sample_lines(self, encoding: str) -> List[str]:
+        """The first DETECT_SAMPLE_LINES non-blank lines of the file, normalized"""
+        sample = []
+        errors = len(self.decode_errors)
+        for line in self.iter_lines(0, None, encoding):
+            line = self.normalize_text(line)
+            if line:
+                sample.append(line)
+                if len(sample) >= self.DETECT_SAMPLE_LINES:
+                    break
+        # Undecodable bytes are reported by the parse itself
+        del self.decode_errors[errors:]
+        return sample
+    
+    def has_headers(self) -> bool:
+        """True if a message header of a known flavour (or of chat_format) is among the first lines"""
+        patterns = [self.CHAT_FORMATS[self.chat_format]] if self.chat_format else self.CHAT_FORMATS.values()
+        return any(pattern.match(line) for line in self.sample_lines(self.detect_encoding())
+                   for pattern in patterns)
+    
+    def iter_media_names(self) -> Iterator[str]:
+        """
+        Attachment names of the chat, from header lines that mention one
+        Much cheaper than iter_messages: no message is built and other lines are only decoded
+        """
+        encoding = self.detect_encoding()
+        if self.chat_format is None or self.date_order is None:
+            self.detect_format(encoding)
+        errors = len(self.decode_errors)
+        try:
+            for line in self.iter_lines(0, None, encoding):
+                if 'attached' not in line.lower():
+                    continue
+                match = self.timestamp_pattern.match(self.normalize_text(line))
+                if match:
+                    media = self.parse_message_line(match.group(4))[3]
+                    if media:
+                        yield media
+        finally:
+            # Undecodable bytes are reported by the parse itself
+            del self.decode_errors[errors:]
+    
+    def iter_lines(self, start: int = 0, end: Optional[int] = None,
+                   encoding: str = 'utf-8') -> Iterator[str]:
+        """
+        Yield decoded lines from the byte range [start, end) of the chat file
+        Splits on LF, CRLF and bare CR exactly like text-mode universal newlines
+        """
+        with self.open_chat() as f:
+            f.seek(start)
+            position = start
+            for raw in f:
+                if end is not None and position >= end:
+                    break
+                # Byte offset of the line being processed (for checkpoints)
+                self.line_offset = position
+                position += len(raw)
+                try:
+                    line = raw.decode(encoding)
+                except UnicodeDecodeError:
+                    line = self.decode_replacing(raw, self.line_offset, encoding)
+                if '\r' in line:
+                    # Drop the line's own break first so it does not yield an empty line
+                    if line.endswith('\n'):
+                        line = line[:-1]
+                    if line.endswith('\r'):
+                        line = line[:-1]
+                    yield from line.replace('\r', '\n').split('\n')
+                else:
+                    yield line
+    
+    def map_chat(self) -> Optional[mmap.mmap]:
+        """Read-only memory map of the chat file, or None for a .zip export or an empty file"""
+        if self.chat_member is not None:
+            return None
+        with open(self.chat_file, 'rb') as f:
+            try:
+                # The map stays valid after the file is closed
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                # Empty file, or a file system without mmap support
+                return None
+    
+    def iter_segments(self, view: mmap.mmap, start: int = 0, end: Optional[int] = None,
+                      encoding: str = 'utf-8') -> Iterator[str]:
+        """
+        Cut the byte range [start, end) of the mapped file before every line that may be
+        a header and yield each piece decoded: one header line plus its continuation lines
+        Only the bytes of each piece are copied and decoded, once; a piece with undecodable
+        bytes gets U+FFFD for them without affecting the rest of the file
+        """
+        end = len(view) if end is None else min(end, len(view))
+        pattern = self.SEGMENT_PATTERN
+        has_cr = view.find(b'\r', start, end) >= 0
+        if has_cr and self.BARE_CR_PATTERN.search(view, start, end):
+            pattern = self.CR_SEGMENT_PATTERN
+        position = start
+        while position < end:
+            # Split a block at a time in C; blocks end at a cut, so no piece spans two
+            block_end = next_position = end
+            if position + self.SEGMENT_BLOCK_BYTES < end:
+                target = position + self.SEGMENT_BLOCK_BYTES
+                match = pattern.search(view, target, min(end, target + self.SEGMENT_BLOCK_BYTES))
+                if match:
+                    block_end, next_position = match.start(), match.end()
+                else:
+                    # No message starts nearby (pasted text): end the block at any line break,
+                    # so the next block starts with continuation lines and no piece grows unbounded
+                    newline = view.find(b'\n', target, end)
+                    if newline >= 0:
+                        block_end, next_position = newline, newline + 1
+            for raw in pattern.split(view[position:block_end]):
+                self.line_offset = position
+                # Every cut removes exactly one line-break byte
+                position += len(raw) + 1
+                if position > end:
+                    # The range's final line break ends the last line, it is not an empty one
+                    if raw.endswith(b'\r\n'):
+                        raw = raw[:-2]
+                    elif raw.endswith((b'\n', b'\r')):
+                        raw = raw[:-1]
+                elif has_cr and raw.endswith(b'\r') and view[position - 1] == 10:
+                    # The CR of a CRLF whose LF was the cut
+                    raw = raw[:-1]
+                try:
+                    text = raw.decode(encoding)
+                except UnicodeDecodeError:
+                    text = self.decode_replacing(raw, self.line_offset, encoding)
+                if '\r' in text:
+                    text = text.replace('\r\n', '\n').replace('\r', '\n')
+                yield text
+            position = next_position
+    
+    def append_lines(self, lines: List[str]) -> int:
+        """
+        Add raw continuation lines to the message being built
+        Blank lines are dropped; returns the number of lines added
+        """
+        lines = [line for line in map(self.normalize_text, lines) if line]
+        if not lines:
+            return 0
+        if self.buffer is None and not (self.max_message_lines or self.max_message_chars):
+            # All of the message's continuation lines at once: one join, no buffer needed
+            text = self.current_message['text']
+            self.current_message['text'] = f"{text}\n" + '\n'.join(lines) if text else '\n'.join(lines)
+        else:
+            (self.buffer or self.start_buffer()).extend(lines)
+        return len(lines)
+    
+    def skip_lines(self, lines: List[str]):
+        """
+        Raw continuation lines with no message to belong to: before the first message,
+        or after one the filters dropped. None of them can start a message, so they are ignored
+        """
+    
+    def iter_messages(self, start: int = 0, end: Optional[int] = None,
+                      encoding: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Parse the WhatsApp chat file incrementally
+        Yields each message as soon as the next timestamp line completes it
+        A plain file is memory-mapped and parsed a message at a time (see iter_segments);
+        a .zip export is streamed line by line
+        """
+        self.current_message = self.buffer = None
+        self.reached_range = self.past_until = False
+        if encoding is None:
+            encoding = self.detect_encoding()
+        if self.chat_format is None or self.date_order is None:
+            self.detect_format(encoding)
+        view = self.map_chat()
+        if view is None:
+            for line in self.iter_lines(start, end, encoding):
+                message = self.process_line(line)
+                if message:
+                    yield message
+                if self.past_until:
+                    break
+        else:
+            with view:
+                for segment in self.iter_segments(view, start, end, encoding):
+                    line, newline, rest = segment.partition('\n')
+                    message = self.process_line(line)
+                    if message:
+                        yield message
+                    # Lines after the first cannot be headers
+                    if newline:
+                        if self.current_message is not None:
+                            self.append_lines(rest.split('\n'))
+                        else:
+                            self.skip_lines(rest.split('\n'))
+                    if self.past_until:
+                        break
+        
+        # Finalize last message
+        message = self.pop_current_message()
+        if message:
+            yield message
+        self.warn_decode_errors(encoding)
+    
+    def find_chunk_boundaries(self, chunks: int, encoding: str) -> List[int]:
+        """
+        Split the file into byte ranges that each start on a timestamp line
+        Continuation lines therefore always stay in the same range as their message
+        """
+        size = self.chat_size()
+        boundaries = [0]
+        searched = 0
+        with self.open_chat() as f:
+            for k in range(1, chunks):
+                target = size * k // chunks
+                if target < searched:
+                    # The previous search went past this point without meeting a header
+                    continue
+                f.seek(target)
+                # Skip the (possibly partial) line we landed in
+                f.readline()
+                while True:
+                    position = f.tell()
+                    raw = f.readline()
+                    if not raw:
+                        position = size
+                        break
+                    line = self.normalize_text(raw.decode(encoding, 'replace'))
+                    if self.timestamp_pattern.match(line):
+                        break
+                searched = position
+                if position > boundaries[-1] and position < size:
+                    boundaries.append(position)
+        boundaries.append(size)
+        return boundaries
+    
+    def worker_options(self) -> Dict:
+        """Constructor arguments needed to rebuild this parser in a worker process"""
+        return {
+            'include_epoch': self.include_epoch,
+            'chat_format': self.chat_format,
+            'date_order': self.date_order,
+            'since': self.since,
+            'until': self.until,
+            'sender': self.sender,
+            'msg_type': self.msg_type,
+            'encoding': self.encoding,
+            'max_message_lines': self.max_message_lines,
+            'max_message_chars': self.max_message_chars,
+            'spill_dir': self.spill_dir,
+        }
+    
+    def iter_chunks_parallel(self, workers: Optional[int] = None,
+                             encode_chunk=None) -> Iterator[Tuple[object, Counter]]:
+        """
+        Parse the file in timestamp-aligned chunks on several processes
+        Yields each chunk's messages (or encode_chunk(messages), computed in the worker)
+        and its count per message type, in file order
+        A .zip export is parsed serially: seeking into a compressed member means decompressing up to it
+        """
+        if self.chat_member is not None:
+            for message in self.iter_messages():
+                yield (encode_chunk or list)([message]), Counter({message['type']: 1})
+            return
+        workers = workers or os.cpu_count() or 1
+        encoding = self.detect_encoding()
+        if self.chat_format is None or self.date_order is None:
+            self.detect_format(encoding)
+        # A few chunks per worker keeps the pool busy when chunks parse unevenly; bounded
+        # chunk sizes keep the messages of one chunk small in memory however large the file
+        chunks = max(workers * 4, -(-self.chat_size() // self.PARALLEL_CHUNK_BYTES))
+        boundaries = self.find_chunk_boundaries(chunks, encoding)
+        options = self.worker_options()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = (executor.submit(_parse_chunk, type(self), self.chat_file, options, encoding,
+                                       start, end, encode_chunk)
+                       for start, end in zip(boundaries[:-1], boundaries[1:]))
+            # Submit lazily: at most PARALLEL_CHUNKS_PER_WORKER chunks per worker are parsed
+            # or waiting, so a slow consumer never lets finished chunks pile up
+            in_flight = deque(islice(futures, workers * self.PARALLEL_CHUNKS_PER_WORKER))
+            while in_flight:
+                chunk, type_counts, decode_errors, capped_messages = in_flight.popleft().result()
+                in_flight.extend(islice(futures, 1))
+                self.decode_errors.extend(decode_errors)
+                self.capped_messages += capped_messages
+                yield chunk, type_counts
+        self.warn_decode_errors(encoding)
+    
+    def iter_messages_parallel(self, workers: Optional[int] = None) -> Iterator[Dict]:
+        """Yields the same messages, in the same order, as iter_messages(), parsed on several processes"""
+        for messages, _ in self.iter_chunks_parallel(workers):
+            yield from messages
+    
+    def write_parallel(self, writer: 'MessageWriter', workers: Optional[int] = None) -> Counter:
+        """
+        Parse on several processes straight into writer; returns the count per message type
+        With a writer that has encode_chunk, each worker encodes its own messages and only
+        the encoded chunk travels back, instead of every message being unpickled and
+        encoded again by this process
+        """
+        type_counts = Counter()
+        if writer.encode_chunk is None:
+            for message in self.iter_messages_parallel(workers):
+                writer.write(message)
+                type_counts[message['type']] += 1
+        else:
+            for data, chunk_types in self.iter_chunks_parallel(workers, writer.encode_chunk):
+                writer.write_chunk(data, sum(chunk_types.values()))
+                type_counts.update(chunk_types)
+        return type_counts
+    
+    def parse(self, workers: int = 1) -> List[Dict]:
+        """Parse the WhatsApp chat file (on several processes if workers != 1)"""
+        if workers == 1:
+            self.messages.extend(self.iter_messages())
+        else:
+            self.messages.extend(self.iter_messages_parallel(workers))
         return self.messages
     
-    def save_json(self, output_file: str):
-        """Save parsed messages to JSON file"""
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(self.messages, f, ensure_ascii=False, indent=2)
+    def parse_store(self, workers: int = 1) -> 'MessageStore':
+        """Parse the WhatsApp chat file into a compact MessageStore"""
+        include_epoch = self.include_epoch
+        # The store keeps integer timestamps, so always have the parser produce them
+        self.include_epoch = True
+        try:
+            messages = self.iter_messages() if workers == 1 else self.iter_messages_parallel(workers)
+            store = MessageStore(include_epoch=include_epoch)
+            store.extend(messages)
+        finally:
+            self.include_epoch = include_epoch
+        return store
+    
+    def prefix_digest(self, length: int) -> str:
+        """SHA-256 of the first length bytes of the chat file"""
+        digest = hashlib.sha256()
+        with self.open_chat() as f:
+            while length > 0:
+                block = f.read(min(length, 1 << 20))
+                if not block:
+                    break
+                digest.update(block)
+                length -= len(block)
+        return digest.hexdigest()
+    
+    def load_checkpoint(self, output_file: str, fmt: str) -> Optional[Dict]:
+        """
+        Read the checkpoint saved next to output_file
+        Returns it only if the output and the already-parsed part of the export are unchanged
+        """
+        try:
+            with open(checkpoint_path(output_file), encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if (checkpoint.get('version') != CHECKPOINT_VERSION
+                or checkpoint['format'] != fmt
+                or checkpoint['include_epoch'] != self.include_epoch
+                or (self.encoding and checkpoint['encoding'] != self.encoding)
+                or checkpoint['max_message_lines'] != self.max_message_lines
+                or checkpoint['max_message_chars'] != self.max_message_chars
+                or checkpoint['spill_dir'] != self.spill_dir
+                or self.chat_size() < checkpoint['offset']):
+            return None
+        # The output must be exactly what the last run left, or resuming would splice into something else
+        try:
+            stat = os.stat(output_file)
+        except OSError:
+            return None
+        if stat.st_size != checkpoint['output_size'] or stat.st_mtime_ns != checkpoint['output_mtime_ns']:
+            return None
+        if self.prefix_digest(checkpoint['offset']) != checkpoint['prefix_sha256']:
+            return None
+        # The new part of the export must still decode like the old one
+        if checkpoint['encoding'] == 'utf-8' and self.detect_encoding(checkpoint['offset']) != 'utf-8':
+            return None
+        return checkpoint
+    
+    def parse_incremental(self, output_file: str, fmt: str = 'json') -> Tuple[int, int]:
+        """
+        Parse only what was added to the export since the last run
+        The last message is always re-parsed, since a re-export may have extended it
+        Returns: (messages kept from the previous output, messages written now)
+        """
+        if self.filtering:
+            raise ValueError("Filters cannot be combined with incremental parsing")
+        checkpoint = self.load_checkpoint(output_file, fmt)
+        if checkpoint:
+            start = checkpoint['offset']
+            encoding = checkpoint['encoding']
+            self.chat_format = checkpoint['chat_format']
+            self.date_order = checkpoint['date_order']
+            self.timestamp_pattern = self.CHAT_FORMATS[self.chat_format]
+            resume = checkpoint['output']
+        else:
+            start = 0
+            encoding = self.detect_encoding()
+            if self.chat_format is None or self.date_order is None:
+                self.detect_format(encoding)
+            resume = None
+        
+        self.current_message = self.buffer = None
+        self.message_offset = start
+        with open_writer(output_file, fmt, resume=resume) as writer:
+            kept = writer.count
+            for line in self.iter_lines(start, None, encoding):
+                message = self.process_line(line)
+                if message:
+                    writer.write(message)
+            
+            # The next run restarts at the last message, so remember the output before it
+            resume_offset = self.message_offset
+            resume_state = writer.state()
+            message = self.pop_current_message()
+            if message:
+                writer.write(message)
+            written = writer.count - kept
+        self.warn_decode_errors(encoding)
+        
+        stat = os.stat(output_file)
+        checkpoint = {
+            'version': CHECKPOINT_VERSION,
+            'format': fmt,
+            'include_epoch': self.include_epoch,
+            'encoding': encoding,
+            'chat_format': self.chat_format,
+            'date_order': self.date_order,
+            'max_message_lines': self.max_message_lines,
+            'max_message_chars': self.max_message_chars,
+            'spill_dir': self.spill_dir,
+            'offset': resume_offset,
+            'prefix_sha256': self.prefix_digest(resume_offset),
+            'output': resume_state,
+            'output_size': stat.st_size,
+            'output_mtime_ns': stat.st_mtime_ns,
+            'last_message': message,
+        }
+        with open(checkpoint_path(output_file), 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+        return kept, written
+    
+    def save_json(self, output_file: str, fmt: str = 'json'):
+        """Save parsed messages to a JSON (or JSON Lines) file"""
+        with open_writer(output_file, fmt) as writer:
+            for message in self.messages:
+                writer.write(message)
         print(f"✓ Parsed {len(self.messages)} messages")
         print(f"✓ Saved to {output_file}")
 
 
+class MessageType(IntEnum):
+    """Message kinds as stored in MessageStore.types"""
+    TEXT = 0
+    MEDIA = 1
+    SYSTEM = 2
+
+
+# Epoch seconds back to the naive wall-clock datetime they were built from
+EPOCH_DATETIME = datetime(1970, 1, 1)
+
+
+class MessageStore:
+    """
+    Columnar message storage: parallel arrays instead of one dict per message
+    Senders are interned to integer ids (0 = no sender), timestamps are epoch
+    integers and types are MessageType values; per-type and per-sender counts
+    are kept up to date on append so statistics are O(1) lookups
+    Exports to the chat.json schema on demand
+    """
+    
+    def __init__(self, include_epoch: bool = False):
+        # Include the 'epoch' field when exporting messages as dicts
+        self.include_epoch = include_epoch
+        self.senders: List[Optional[str]] = [None]
+        self.sender_ids: Dict[str, int] = {}
+        self.epochs = array('q')
+        self.sender_column = array('I')
+        self.types = array('B')
+        self.texts: List[str] = []
+        # Sparse columns: message index -> value
+        self.media: Dict[int, str] = {}
+        self.overflow_files: Dict[int, str] = {}
+        self.invalid_timestamps: Dict[int, str] = {}
+        self.type_counts = [0] * len(MessageType)
+        self.sender_counts: List[int] = [0]
+    
+    def __len__(self) -> int:
+        return len(self.types)
+    
+    def intern_sender(self, sender: Optional[str]) -> int:
+        """Return the integer id of a sender, registering it on first sight"""
+        if sender is None:
+            return 0
+        sender_id = self.sender_ids.get(sender)
+        if sender_id is None:
+            sender_id = self.sender_ids[sender] = len(self.senders)
+            self.senders.append(sender)
+            self.sender_counts.append(0)
+        return sender_id
+    
+    def append(self, message: Dict):
+        """Add a parsed message (it must carry the 'epoch' field)"""
+        index = len(self.types)
+        epoch = message['epoch']
+        if epoch is None:
+            self.invalid_timestamps[index] = message['timestamp']
+            epoch = 0
+        sender_id = self.intern_sender(message['sender'])
+        msg_type = MessageType[message['type'].upper()]
+        
+        self.epochs.append(epoch)
+        self.sender_column.append(sender_id)
+        self.types.append(msg_type)
+        self.texts.append(message['text'])
+        if message['media'] is not None:
+            self.media[index] = message['media']
+        if 'overflow_file' in message:
+            self.overflow_files[index] = message['overflow_file']
+        self.type_counts[msg_type] += 1
+        self.sender_counts[sender_id] += 1
+    
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+    
+    def timestamp(self, index: int) -> str:
+        """ISO-8601 timestamp of a message, exactly as the parser produced it"""
+        invalid = self.invalid_timestamps.get(index)
+        if invalid is not None:
+            return invalid
+        return (EPOCH_DATETIME + timedelta(seconds=self.epochs[index])).isoformat()
+    
+    def __getitem__(self, index: int) -> Dict:
+        """Message in the chat.json schema"""
+        message = {
+            'timestamp': self.timestamp(index),
+            'sender': self.senders[self.sender_column[index]],
+            'type': MessageType(self.types[index]).name.lower(),
+            'text': self.texts[index],
+            'media': self.media.get(index),
+        }
+        if self.include_epoch:
+            message['epoch'] = None if index in self.invalid_timestamps else self.epochs[index]
+        if index in self.overflow_files:
+            message['overflow_file'] = self.overflow_files[index]
+        return message
+    
+    def __iter__(self) -> Iterator[Dict]:
+        for index in range(len(self)):
+            yield self[index]
+    
+    def count(self, msg_type: Optional[str] = None, sender: Optional[str] = None) -> int:
+        """Number of messages of one type or from one sender (O(1))"""
+        if msg_type is not None:
+            return self.type_counts[MessageType[msg_type.upper()]]
+        if sender is not None:
+            sender_id = self.sender_ids.get(sender)
+            return self.sender_counts[sender_id] if sender_id else 0
+        return len(self)
+    
+    def save_json(self, output_file: str, fmt: str = 'json'):
+        """Export the messages in the chat.json schema"""
+        with open_writer(output_file, fmt) as writer:
+            for message in self:
+                writer.write(message)
+
+
+class MessageWriter:
+    """
+    Incremental message serializer
+    Messages are written as they arrive so a partial run still leaves usable output
+    """
+    
+    def __init__(self, output_file: str, resume: Optional[Dict] = None):
+        self.output_file = output_file
+        # resume is a state() from an earlier run: keep that output and append after it
+        self.count = resume['count'] if resume else 0
+    
+    # Encodes a list of messages into what write_chunk takes, for writers whose output
+    # can be produced by worker processes (see WhatsAppParser.write_parallel)
+    encode_chunk = None
+    
+    def write(self, message: Dict):
+        raise NotImplementedError
+    
+    def write_chunk(self, data: bytes, count: int):
+        """Append count messages encoded by encode_chunk"""
+        raise NotImplementedError
+    
+    def state(self) -> Dict:
+        """Where the output stands now, for resuming it later"""
+        return {'count': self.count}
+    
+    def close(self):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class StreamMessageWriter(MessageWriter):
+    """Base for writers that append encoded text to a byte stream"""
+    
+    # Compact encoder shared by all writers (no indent padding)
+    ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    
+    def __init__(self, output_file: str, resume: Optional[Dict] = None):
+        super().__init__(output_file, resume)
+        if resume:
+            # Drop whatever was written after the resume point (e.g. a closing bracket)
+            self._file = open(output_file, 'r+b')
+            self._file.truncate(resume['position'])
+            self._file.seek(resume['position'])
+            self.position = resume['position']
+        else:
+            self._file = open(output_file, 'wb')
+            # Bytes written so far
+            self.position = 0
+    
+    def state(self) -> Dict:
+        return {'count': self.count, 'position': self.position}
+    
+    def _emit(self, data: str):
+        self._emit_bytes(data.encode('utf-8'))
+    
+    def _emit_bytes(self, raw: bytes):
+        self._file.write(raw)
+        self.position += len(raw)
+    
+    def close(self):
+        self._file.close()
+
+
+class JSONArrayWriter(StreamMessageWriter):
+    """Write a JSON array with one message per line"""
+    
+    def __init__(self, output_file: str, resume: Optional[Dict] = None):
+        super().__init__(output_file, resume)
+        if not resume:
+            self._emit('[')
+    
+    def write(self, message: Dict):
+        separator = ',\n' if self.count else '\n'
+        self._emit(separator + self.ENCODER.encode(message))
+        self.count += 1
+    
+    @classmethod
+    def encode_chunk(cls, messages: List[Dict]) -> bytes:
+        return ',\n'.join(map(cls.ENCODER.encode, messages)).encode('utf-8')
+    
+    def write_chunk(self, data: bytes, count: int):
+        if count:
+            self._emit_bytes((b',\n' if self.count else b'\n') + data)
+            self.count += count
+    
+    def close(self):
+        # Always close the array so an interrupted parse is still valid JSON
+        if not self._file.closed:
+            self._emit('\n]\n')
+        super().close()
+
+
+class JSONLinesWriter(StreamMessageWriter):
+    """Write one JSON object per line (JSON Lines)"""
+    
+    def write(self, message: Dict):
+        self._emit(self.ENCODER.encode(message) + '\n')
+        self.count += 1
+    
+    @classmethod
+    def encode_chunk(cls, messages: List[Dict]) -> bytes:
+        return ''.join(cls.ENCODER.encode(message) + '\n' for message in messages).encode('utf-8')
+    
+    def write_chunk(self, data: bytes, count: int):
+        self._emit_bytes(data)
+        self.count += count
+
+
+class SQLiteWriter(MessageWriter):
+    """
+    Write messages to an indexed SQLite database
+    Date ranges, single senders or just the media rows can then be queried
+    without loading the whole chat (see iter_sqlite_messages)
+    """
+    
+    SCHEMA = """
+        CREATE TABLE messages (
+            id            INTEGER PRIMARY KEY,   -- position in the export, from 1
+            timestamp     TEXT NOT NULL,         -- ISO-8601, sorts chronologically
+            epoch         INTEGER,               -- only filled when parsed with --epoch
+            sender        TEXT,
+            type          TEXT NOT NULL,
+            text          TEXT NOT NULL,
+            media         TEXT,
+            overflow_file TEXT                   -- full text of a message cut by the caps (--spill-dir)
+        )
+    """
+    # Built after the bulk load, which is much faster than maintaining them per insert
+    INDEXES = [
+        'CREATE INDEX IF NOT EXISTS messages_timestamp ON messages (timestamp)',
+        'CREATE INDEX IF NOT EXISTS messages_sender ON messages (sender, timestamp)',
+        'CREATE INDEX IF NOT EXISTS messages_type ON messages (type, timestamp)',
+    ]
+    BATCH_SIZE = 10000
+    
+    def __init__(self, output_file: str, resume: Optional[Dict] = None):
+        super().__init__(output_file, resume)
+        if not resume and os.path.exists(output_file):
+            os.remove(output_file)
+        self._db = sqlite3.connect(output_file)
+        # Bulk load: the output is rebuilt from the export if anything goes wrong
+        self._db.execute('PRAGMA journal_mode = MEMORY')
+        self._db.execute('PRAGMA synchronous = OFF')
+        if resume:
+            with self._db:
+                self._db.execute('DELETE FROM messages WHERE id > ?', (self.count,))
+        else:
+            self._db.execute(self.SCHEMA)
+        self._rows = []
+    
+    def write(self, message: Dict):
+        self.count += 1
+        self._rows.append((
+            self.count, message['timestamp'], message.get('epoch'), message['sender'],
+            message['type'], message['text'], message['media'], message.get('overflow_file'),
+        ))
+        if len(self._rows) >= self.BATCH_SIZE:
+            self._flush()
+    
+    def _flush(self):
+        # Committing per batch keeps the rows written so far if the parse dies
+        with self._db:
+            self._db.executemany('INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?)', self._rows)
+        self._rows = []
+    
+    def close(self):
+        if self._db is None:
+            return
+        self._flush()
+        with self._db:
+            for statement in self.INDEXES:
+                self._db.execute(statement)
+        self._db.close()
+        self._db = None
+
+
+def iter_sqlite_messages(db_file: str, since: Optional[str] = None, until: Optional[str] = None,
+                         sender: Optional[str] = None, msg_type: Optional[str] = None,
+                         include_epoch: bool = False) -> Iterator[Dict]:
+    """
+    Query a database written by SQLiteWriter, in file order
+    since/until are ISO-8601 prefixes (inclusive; a bare date covers the whole day)
+    """
+    conditions, params = [], []
+    if since:
+        conditions.append('timestamp >= ?')
+        params.append(since)
+    if until:
+        conditions.append('timestamp <= ?')
+        # Any time on a bare date still counts as that date
+        params.append(until + '\uffff')
+    if sender is not None:
+        conditions.append('sender = ?')
+        params.append(sender)
+    if msg_type is not None:
+        conditions.append('type = ?')
+        params.append(msg_type)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    
+    db = sqlite3.connect(db_file)
+    try:
+        rows = db.execute(
+            f'SELECT timestamp, sender, type, text, media, epoch, overflow_file FROM messages {where} ORDER BY id',
+            params,
+        )
+        for timestamp, sender_name, type_name, text, media, epoch, overflow_file in rows:
+            message = {
+                'timestamp': timestamp,
+                'sender': sender_name,
+                'type': type_name,
+                'text': text,
+                'media': media,
+            }
+            if include_epoch:
+                message['epoch'] = epoch
+            if overflow_file is not None:
+                message['overflow_file'] = overflow_file
+            yield message
+    finally:
+        db.close()
+
+
+def _parse_chunk(parser_class, chat_file: str, options: Dict, encoding: str,
+                 start: int, end: int, encode_chunk=None) -> Tuple[object, Counter, List[int], int]:
+    """Worker entry point: parse one byte range with a fresh parser (and encode it with encode_chunk)"""
+    parser = parser_class(chat_file, **options)
+    # The parent warns once for all chunks
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UnicodeWarning)
+        messages = list(parser.iter_messages(start, end, encoding))
+    type_counts = Counter(message['type'] for message in messages)
+    chunk = encode_chunk(messages) if encode_chunk else messages
+    return chunk, type_counts, parser.decode_errors, parser.capped_messages
+
+
+OUTPUT_FORMATS = {
+    'json': JSONArrayWriter,
+    'jsonl': JSONLinesWriter,
+    'sqlite': SQLiteWriter,
+}
+
+
+def open_writer(output_file: str, fmt: str = 'json', resume: Optional[Dict] = None) -> MessageWriter:
+    """
+    Create the incremental writer for an output format
+    Starting a fresh output removes the checkpoint of the previous one, which no longer fits it
+    """
+    try:
+        writer_class = OUTPUT_FORMATS[fmt]
+    except KeyError:
+        raise ValueError(f"Unknown output format: {fmt}")
+    if resume is None:
+        try:
+            os.remove(checkpoint_path(output_file))
+        except FileNotFoundError:
+            pass
+    return writer_class(output_file, resume)
+
+
+# Bump when the checkpoint layout or the parser output changes
+CHECKPOINT_VERSION = 4
+
+
+def checkpoint_path(output_file: str) -> str:
+    """Checkpoint file kept next to an incremental output"""
+    return output_file + ".checkpoint"
+
+
+def report_capped(parser: WhatsAppParser, spill_dir: Optional[str]):
+    """Say how many messages --max-message-lines/--max-message-chars cut short"""
+    if parser.capped_messages:
+        where = f"; their full text is in {spill_dir}" if spill_dir else ''
+        print(f"⚠️  {parser.capped_messages} messages were longer than the limits and were cut{where}")
+
+
 def main():
-    import sys
+    import argparse
+    from profiling import ProfiledParser, add_profile_arguments, profile_from_args, profile_writer
+    
+    arg_parser = argparse.ArgumentParser(
+        description='Convert a WhatsApp Android .txt export to JSON',
+        epilog='Example:\n  python parser.py chat.txt chat.json',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    arg_parser.add_argument('chat_file', help='WhatsApp .txt export, or the .zip WhatsApp shares')
+    arg_parser.add_argument('output_file', nargs='?',
+                            help='Output file (default: chat.json / chat.jsonl)')
+    arg_parser.add_argument('--format', choices=sorted(OUTPUT_FORMATS), default='json',
+                            help='Output format (default: json)')
+    arg_parser.add_argument('--epoch', action='store_true',
+                            help='Add an integer epoch-seconds field to every message')
+    arg_parser.add_argument('--chat-format', choices=sorted(WhatsAppParser.CHAT_FORMATS),
+                            help='Export flavour (default: detect from the file)')
+    arg_parser.add_argument('--date-order', choices=['dmy', 'mdy'],
+                            help='Date field order (default: detect from the file)')
+    arg_parser.add_argument('--encoding',
+                            help='Text encoding of the export, e.g. cp1252 (default: UTF-8, or latin-1 '
+                                 'if the start of the file is not UTF-8)')
+    arg_parser.add_argument('--max-message-lines', metavar='N', type=int,
+                            help='Cut messages after N lines (pasted logs, stray text without timestamps)')
+    arg_parser.add_argument('--max-message-chars', metavar='N', type=int,
+                            help='Cut messages after N characters')
+    arg_parser.add_argument('--spill-dir', metavar='DIR',
+                            help='With a cap, save the full text of each cut message as a file in DIR')
+    arg_parser.add_argument('--since', metavar='DATE', type=iso_prefix,
+                            help='Only keep messages from this date or date-time on (e.g. 2025-11-01)')
+    arg_parser.add_argument('--until', metavar='DATE', type=iso_prefix,
+                            help='Only keep messages up to this date or date-time (inclusive, e.g. 2025-11)')
+    arg_parser.add_argument('--sender', metavar='NAME',
+                            help='Only keep messages from this sender (exact name)')
+    arg_parser.add_argument('--type', dest='msg_type', choices=['text', 'media', 'system'],
+                            help='Only keep messages of this type')
+    arg_parser.add_argument('--incremental', action='store_true',
+                            help='Only parse what was added since the last run into the same output')
+    arg_parser.add_argument('--workers', type=int, default=1,
+                            help='Parse on N processes (0 = all cores, default: 1)')
+    arg_parser.add_argument('--stats', metavar='PATH',
+                            help='Also save senders, activity and response-time statistics (.json, or a folder of CSVs)')
+    add_profile_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    if args.incremental and (args.since or args.until or args.sender is not None or args.msg_type):
+        arg_parser.error('--since/--until/--sender/--type cannot be combined with --incremental')
+    for cap in ('max_message_lines', 'max_message_chars'):
+        if getattr(args, cap) is not None and getattr(args, cap) < 1:
+            arg_parser.error(f"--{cap.replace('_', '-')} must be at least 1")
+    if args.spill_dir and not (args.max_message_lines or args.max_message_chars):
+        arg_parser.error('--spill-dir needs --max-message-lines or --max-message-chars')
     
-    if len(sys.argv) < 2:
-        print("Usage: python parser.py <chat_file.txt> [output.json]")
-        print("\nExample:")
-        print("  python parser.py chat.txt chat.json")
-        sys.exit(1)
+    output_file = args.output_file or f"chat.{args.format}"
+    options = {'include_epoch': args.epoch, 'chat_format': args.chat_format, 'date_order': args.date_order,
+               'since': args.since, 'until': args.until, 'sender': args.sender, 'msg_type': args.msg_type,
+               'encoding': args.encoding, 'max_message_lines': args.max_message_lines,
+               'max_message_chars': args.max_message_chars, 'spill_dir': args.spill_dir}
+    profile = profile_from_args(args)
+    if profile:
+        # Same output, with the per-line work charged to stages
+        profile.start()
+        parser = ProfiledParser(args.chat_file, profile, **options)
+    else:
+        parser = WhatsAppParser(args.chat_file, **options)
     
-    chat_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else 'chat.json'
+    # Undecodable bytes are reported with the results instead of as a raw warning
+    caught = warnings.catch_warnings(record=True)
     
-    parser = WhatsAppParser(chat_file)
-    messages = parser.parse()
-    parser.save_json(output_file)
+    if args.incremental:
+        with caught as decode_warnings:
+            kept, written = parser.parse_incremental(output_file, args.format)
+        if kept:
+            print(f"✓ Kept {kept} messages from the previous run")
+        print(f"✓ Parsed {written} {'new ' if kept else ''}messages")
+        print(f"✓ Saved to {output_file}")
+        for warning in decode_warnings:
+            print(f"⚠️  {warning.message}")
+        report_capped(parser, args.spill_dir)
+        if profile:
+            profile.stop()
+            profile.save(args.profile)
+        return
+    
+    # Stream messages straight from the parser to the writer; --stats gathers the full
+    # statistics on the way, otherwise only the types are counted
+    analytics = None
+    if args.stats:
+        from analytics import ChatAnalytics
+        analytics = ChatAnalytics()
+    type_counts = Counter()
+    with caught as decode_warnings, open_writer(output_file, args.format) as writer:
+        if profile:
+            profile_writer(writer, profile)
+        # Worker processes would parse outside the profile, so a profiled run is serial
+        if args.workers != 1 and not profile and not analytics:
+            type_counts = parser.write_parallel(writer, args.workers or None)
+        else:
+            if args.workers == 1 or profile:
+                messages = parser.iter_messages()
+            else:
+                messages = parser.iter_messages_parallel(args.workers or None)
+            if analytics:
+                messages = analytics.track(messages)
+            for message in messages:
+                writer.write(message)
+                type_counts[message['type']] += 1
+    if profile:
+        profile.stop()
+    
+    print(f"✓ Parsed {writer.count} messages{' matching the filters' if parser.filtering else ''}")
+    print(f"✓ Saved to {output_file}")
+    for warning in decode_warnings:
+        print(f"⚠️  {warning.message}")
+    report_capped(parser, args.spill_dir)
     
     # Print statistics
     print(f"\nStatistics:")
-    print(f"  Text messages: {sum(1 for m in messages if m['type'] == 'text')}")
-    print(f"  Media messages: {sum(1 for m in messages if m['type'] == 'media')}")
-    print(f"  System messages: {sum(1 for m in messages if m['type'] == 'system')}")
+    print(f"  Text messages: {type_counts['text']}")
+    print(f"  Media messages: {type_counts['media']}")
+    print(f"  System messages: {type_counts['system']}")
+    if analytics:
+        if args.stats.lower().endswith('.json'):
+            analytics.write_json(args.stats)
+        else:
+            analytics.write_csv(args.stats)
+        print(f"✓ Saved statistics to {args.stats}")
+    if profile:
+        profile.save(args.profile)
 
 
 if __name__ == '__main__':
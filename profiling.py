@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+WhatsApp Pipeline Profiling
+Wall/CPU time per stage, counters and peak memory for parser.py and make_standalone.py runs
+(--profile), with optional cProfile and tracemalloc detail, saved as a JSON report
+"""
+
+import sys
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from parser import WhatsAppParser, normalize_text
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows - peak RSS is reported as null there
+    resource = None
+
+perf_counter = time.perf_counter
+process_time = time.process_time
+# Allocation sites listed in the report when tracemalloc is on
+TRACEMALLOC_TOP = 15
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of the current process in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class Stage:
+    """Accumulated time of one stage; hot stages only track wall time (process_time costs ~0.5 µs a call)"""
+    __slots__ = ('seconds', 'cpu_seconds', 'calls', 'hot')
+
+    def __init__(self, hot: bool = False):
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.calls = 0
+        self.hot = hot
+
+
+class Profile:
+    """
+    Stage timings and counters for one run
+    Coarse stages (detection, rendering a chunk, ...) use stage() and get wall and CPU time;
+    per-line stages use hot() and perf_counter only, corrected by a calibrated timer overhead
+    """
+
+    def __init__(self, cprofile_path: Optional[str] = None, trace_memory: bool = False):
+        self.stages: Dict[str, Stage] = {}
+        self.counters: Dict[str, int] = {}
+        self.cprofile_path = cprofile_path
+        self.trace_memory = trace_memory
+        self.profiler = None
+        self.memory: Optional[Dict] = None
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.timer_bias, self.timer_overhead = self.calibrate()
+
+    @staticmethod
+    def calibrate(rounds: int = 200_000):
+        """
+        Per-call cost of a hot() timer: (time it adds inside the measured interval, total time it adds)
+        Measured around a no-op exactly the way the instrumented methods time their work
+        """
+        stage = Stage(hot=True)
+
+        def bare(value):
+            return value
+
+        def timed(value):
+            start = perf_counter()
+            value = bare(value)
+            stage.seconds += perf_counter() - start
+            stage.calls += 1
+            return value
+
+        start = perf_counter()
+        for value in range(rounds):
+            bare(value)
+        bare_seconds = perf_counter() - start
+        start = perf_counter()
+        for value in range(rounds):
+            timed(value)
+        timed_seconds = perf_counter() - start
+        return stage.seconds / rounds, max(0.0, timed_seconds - bare_seconds) / rounds
+
+    def hot(self, name: str) -> Stage:
+        """Accumulator for a per-line stage; callers add perf_counter differences and calls themselves"""
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(hot=True)
+        return stage
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a coarse stage (wall and CPU); re-entering the same name accumulates"""
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage()
+        start = perf_counter()
+        cpu_start = process_time()
+        try:
+            yield stage
+        finally:
+            stage.seconds += perf_counter() - start
+            stage.cpu_seconds += process_time() - cpu_start
+            stage.calls += 1
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def timed_iter(self, items: Iterable, name: str) -> Iterator:
+        """Yield from items, charging the time spent producing each one to a hot stage"""
+        stage = self.hot(name)
+        items = iter(items)
+        while True:
+            start = perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                stage.seconds += perf_counter() - start
+                return
+            stage.seconds += perf_counter() - start
+            stage.calls += 1
+            yield item
+
+    def start(self):
+        """Start the clocks and, if requested, cProfile and tracemalloc"""
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+        if self.cprofile_path:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.wall_seconds = perf_counter()
+        self.cpu_seconds = process_time()
+
+    def stop(self):
+        self.wall_seconds = perf_counter() - self.wall_seconds
+        self.cpu_seconds = process_time() - self.cpu_seconds
+        if self.profiler:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.cprofile_path)
+        if self.trace_memory:
+            import tracemalloc
+            # Live allocations at the end of the run; tracemalloc keeps no per-site peak
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.memory = {
+                'current_mb': round(current / 1e6, 1),
+                'peak_mb': round(peak / 1e6, 1),
+                'top': [
+                    {'where': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                     'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+                    for stat in snapshot.statistics('lineno')[:TRACEMALLOC_TOP]
+                ],
+            }
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def report(self) -> Dict:
+        """Machine-readable report: stages, counters, memory and timer calibration"""
+        stages = {}
+        instrumentation = 0.0
+        accounted = 0.0
+        for name, stage in self.stages.items():
+            seconds = stage.seconds
+            if stage.hot:
+                # Take out the timer's own share of each measured interval
+                seconds = max(0.0, seconds - stage.calls * self.timer_bias)
+                instrumentation += stage.calls * self.timer_overhead
+            accounted += seconds
+            stages[name] = {
+                'wall_seconds': round(seconds, 4),
+                'cpu_seconds': None if stage.hot else round(stage.cpu_seconds, 4),
+                'calls': stage.calls,
+                'share': round(seconds / self.wall_seconds, 4) if self.wall_seconds else None,
+            }
+
+        report = {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'command': ' '.join(sys.argv),
+            'python': sys.version.split()[0],
+            'wall_seconds': round(self.wall_seconds, 4),
+            'cpu_seconds': round(self.cpu_seconds, 4),
+            'stages': stages,
+            # Estimated time the hot-stage timers added to the run
+            'instrumentation_seconds': round(instrumentation, 4),
+            # Everything between the stages: the loop itself, building message dicts, counters
+            'other_seconds': round(max(0.0, self.wall_seconds - accounted - instrumentation), 4),
+            'timer_overhead_ns': round(self.timer_overhead * 1e9),
+            'counters': self.counters,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+        if self.memory:
+            report['tracemalloc'] = self.memory
+        if self.cprofile_path:
+            report['cprofile'] = self.cprofile_path
+        return report
+
+    def save(self, path: str) -> Dict:
+        """Write the report to path and print a summary; returns the report"""
+        report = self.report()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print_report(report)
+        print(f"✓ Saved profile to {path}")
+        if self.cprofile_path:
+            print(f"✓ Saved cProfile stats to {self.cprofile_path} (view with: python -m pstats {self.cprofile_path})")
+        return report
+
+
+def print_report(report: Dict):
+    """Stage table, counters and memory of a report"""
+    print(f"\n{'Stage':<18} {'Wall s':>9} {'CPU s':>9} {'Calls':>11} {'Share':>7}")
+    for name, stage in sorted(report['stages'].items(), key=lambda item: -item[1]['wall_seconds']):
+        cpu = '-' if stage['cpu_seconds'] is None else f"{stage['cpu_seconds']:.3f}"
+        share = '' if stage['share'] is None else f"{stage['share']:.1%}"
+        print(f"{name:<18} {stage['wall_seconds']:>9.3f} {cpu:>9} {stage['calls']:>11,} {share:>7}")
+    print(f"{'(other)':<18} {report['other_seconds']:>9.3f}")
+    print(f"{'(timers)':<18} {report['instrumentation_seconds']:>9.3f}")
+    print(f"{'(total)':<18} {report['wall_seconds']:>9.3f} {report['cpu_seconds']:>9.3f}")
+    if report['counters']:
+        print('\n' + '   '.join(f"{name}: {value:,}" for name, value in sorted(report['counters'].items())))
+    memory = f"Peak RSS: {report['peak_rss_mb']} MB" if report['peak_rss_mb'] is not None else ''
+    if 'tracemalloc' in report:
+        memory += f"   Python allocations peak: {report['tracemalloc']['peak_mb']} MB"
+    if memory:
+        print(memory)
+
+
+class TimedPattern:
+    """Stands in for a compiled regex, charging match() to a stage"""
+    __slots__ = ('pattern', 'stage')
+
+    def __init__(self, pattern, stage: Stage):
+        self.pattern = pattern
+        self.stage = stage
+
+    def match(self, line: str):
+        start = perf_counter()
+        match = self.pattern.match(line)
+        self.stage.seconds += perf_counter() - start
+        self.stage.calls += 1
+        return match
+
+
+class ProfiledParser(WhatsAppParser):
+    """
+    WhatsAppParser that charges its per-line work to profile stages and counts what it sees:
+    read (file read and decode), normalize, match (header regex), timestamp, classify
+    (sender/type/media), plus lines, headers, continuation lines and dropped lines
+    Output is identical to WhatsAppParser's; parallel chunks run unprofiled in their workers
+    """
+
+    def __init__(self, chat_file: str, profile: Optional[Profile] = None, **options):
+        self.profile = profile or Profile()
+        self.read_stage = self.profile.hot('read')
+        self.normalize_stage = self.profile.hot('normalize')
+        self.match_stage = self.profile.hot('match')
+        self.timestamp_stage = self.profile.hot('timestamp')
+        self.classify_stage = self.profile.hot('classify')
+        self.last_line = ''
+        self.header_line = False
+        super().__init__(chat_file, **options)
+
+    @property
+    def timestamp_pattern(self):
+        return self._timestamp_pattern
+
+    @timestamp_pattern.setter
+    def timestamp_pattern(self, pattern):
+        # Reassigned when the format is detected, so wrap whichever pattern wins
+        self._timestamp_pattern = TimedPattern(pattern, self.match_stage)
+
+    def detect_encoding(self, start: int = 0) -> str:
+        with self.profile.stage('detect'):
+            return super().detect_encoding(start)
+
+    def detect_format(self, encoding: str):
+        with self.profile.stage('detect'):
+            super().detect_format(encoding)
+
+    def iter_lines(self, start: int = 0, end: Optional[int] = None,
+                   encoding: str = 'utf-8') -> Iterator[str]:
+        stage = self.read_stage
+        lines = super().iter_lines(start, end, encoding)
+        while True:
+            begin = perf_counter()
+            line = next(lines, None)
+            stage.seconds += perf_counter() - begin
+            if line is None:
+                return
+            stage.calls += 1
+            yield line
+
+    def iter_segments(self, view, start: int = 0, end: Optional[int] = None,
+                      encoding: str = 'utf-8') -> Iterator[str]:
+        stage = self.read_stage
+        begin = perf_counter()
+        segments = super().iter_segments(view, start, end, encoding)
+        while True:
+            segment = next(segments, None)
+            stage.seconds += perf_counter() - begin
+            if segment is None:
+                return
+            stage.calls += 1
+            yield segment
+            begin = perf_counter()
+
+    def append_lines(self, lines: List[str]) -> int:
+        # Continuation lines of a mapped file come here instead of through process_line
+        added = super().append_lines(lines)
+        self.profile.count('continuation_lines', added)
+        self.profile.count('blank_lines', len(lines) - added)
+        return added
+
+    def skip_lines(self, lines: List[str]):
+        # Counted exactly as the line-by-line path would; none of these can start a message
+        for line in lines:
+            self.process_line(line)
+
+    def normalize_text(self, text: str) -> str:
+        start = perf_counter()
+        text = normalize_text(text)
+        self.normalize_stage.seconds += perf_counter() - start
+        self.normalize_stage.calls += 1
+        self.last_line = text
+        return text
+
+    def convert_timestamp(self, date_str: str, time_str: str, period: str, date_order: str = 'dmy'):
+        start = perf_counter()
+        result = WhatsAppParser.convert_timestamp(date_str, time_str, period, date_order)
+        self.timestamp_stage.seconds += perf_counter() - start
+        self.timestamp_stage.calls += 1
+        if result[1] is None:
+            self.profile.count('invalid_timestamps')
+        return result
+
+    def parse_message_line(self, sender_and_text: str, marked: bool = False):
+        start = perf_counter()
+        result = super().parse_message_line(sender_and_text, marked)
+        self.classify_stage.seconds += perf_counter() - start
+        self.classify_stage.calls += 1
+        self.profile.count(f"{result[1]}_messages")
+        return result
+
+    def wanted_header(self, date_str: str, sender_and_text: str) -> bool:
+        self.header_line = True
+        return super().wanted_header(date_str, sender_and_text)
+
+    def process_line(self, line: str) -> Optional[Dict]:
+        before = self.current_message
+        self.last_line = None
+        self.header_line = False
+        finished = super().process_line(line)
+        # Counters from what the line did to the message being built
+        if self.last_line is None:
+            # Dropped by the filters before normalization
+            self.profile.count('skipped_lines')
+        elif not self.last_line:
+            self.profile.count('blank_lines')
+        elif self.header_line or self.current_message is not before:
+            self.profile.count('header_lines')
+        elif before is not None:
+            self.profile.count('continuation_lines')
+        else:
+            self.profile.count('unmatched_lines')
+        return finished
+
+
+def profile_writer(writer, profile: Profile):
+    """
+    Charge a message writer's work to 'serialize' (JSON encoding) and 'write' (file output)
+    Writers without a shared encoder (SQLite) are timed as a whole under 'write'
+    """
+    write_stage = profile.hot('write')
+    encoder = getattr(writer, 'ENCODER', None)
+    if encoder is None:
+        write = writer.write
+
+        def timed_write(message):
+            start = perf_counter()
+            write(message)
+            write_stage.seconds += perf_counter() - start
+            write_stage.calls += 1
+        writer.write = timed_write
+        return writer
+
+    serialize_stage = profile.hot('serialize')
+    encode = encoder.encode
+    output = writer._file
+
+    class TimedEncoder:
+        @staticmethod
+        def encode(message):
+            start = perf_counter()
+            data = encode(message)
+            serialize_stage.seconds += perf_counter() - start
+            serialize_stage.calls += 1
+            return data
+
+    class TimedFile:
+        closed = property(lambda self: output.closed)
+
+        @staticmethod
+        def write(data):
+            start = perf_counter()
+            written = output.write(data)
+            write_stage.seconds += perf_counter() - start
+            write_stage.calls += 1
+            return written
+
+        @staticmethod
+        def close():
+            output.close()
+
+    writer.ENCODER = TimedEncoder()
+    writer._file = TimedFile()
+    return writer
+
+
+def add_profile_arguments(arg_parser):
+    """The --profile options shared by the command line tools"""
+    arg_parser.add_argument('--profile', metavar='REPORT', nargs='?', const='profile.json',
+                            help='Time each stage, count lines and record peak memory; '
+                                 'print a summary and save the report as JSON (default: profile.json)')
+    arg_parser.add_argument('--profile-cprofile', metavar='PATH',
+                            help='With --profile, also dump cProfile stats (python -m pstats PATH)')
+    arg_parser.add_argument('--profile-memory', action='store_true',
+                            help='With --profile, trace Python allocations with tracemalloc (slow)')
+
+
+def profile_from_args(args) -> Optional[Profile]:
+    """A Profile for the parsed --profile options, or None when profiling is off"""
+    if not (args.profile or args.profile_cprofile or args.profile_memory):
+        return None
+    if not args.profile:
+        args.profile = 'profile.json'
+    return Profile(cprofile_path=args.profile_cprofile, trace_memory=args.profile_memory)
\ No newline at end of file